@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+El stream de horarios (core.views.horarios_stream, Server-Sent Events) solo
+funciona bajo ASGI, p.ej. en local: uvicorn Brujitas.asgi:application
 """
 
 import os
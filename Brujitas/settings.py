@@ -127,6 +127,35 @@ else:
         }
     }
 
+# --------------------------------------------------
+# CACHE (feed del calendario, códigos de reset)
+# --------------------------------------------------
+# LocMem es por proceso: solo guarda los snapshots del feed, con la versión del
+# calendario en la llave. La versión vive en la BD (core.VersionCalendario), así que
+# un cambio de cualquier proceso invalida los snapshots de todos.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "brujitas",
+    }
+}
+
+# --------------------------------------------------
+# CALENDARIO
+# --------------------------------------------------
+# Semanas hacia adelante en que se materializan los Horario (manage.py materializar_horarios)
+HORARIOS_SEMANAS = int(os.getenv("HORARIOS_SEMANAS", "8"))
+# Horas que se guarda la respuesta de una reserva por su Idempotency-Key
+IDEMPOTENCIA_HORAS = int(os.getenv("IDEMPOTENCIA_HORAS", "24"))
+# Minutos que un horario queda retenido para quien lo eligió mientras confirma
+RETENCION_MINUTOS = int(os.getenv("RETENCION_MINUTOS", "5"))
+# Minutos que se aparta un horario liberado para el primero de la lista de espera.
+# Si no lo confirma, pasa al siguiente al primer pedido del feed tras el vencimiento
+# (core.retencion_utils.retenciones_activas), sin esperar al cron
+ESPERA_RETENCION_MINUTOS = int(os.getenv("ESPERA_RETENCION_MINUTOS", "30"))
+# Horas antes de una cita confirmada en que se envía el recordatorio (manage.py enviar_recordatorios)
+RECORDATORIO_HORAS = int(os.getenv("RECORDATORIO_HORAS", "24"))
+
 # --------------------------------------------------
 # AUTH
 # --------------------------------------------------
@@ -200,7 +229,9 @@ DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", SENDGRID_FROM_EMAIL)
 
 EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "20"))
 
-# Esto hace que *cualquier* send_mail() (reset password, confirmaciones, etc.) use SendGrid API
+# Esto hace que *cualquier* send_mail() (reset password, confirmaciones, etc.) use SendGrid API.
+# Las vistas no envían directo: encolan en CorreoPendiente y el worker
+# (manage.py enviar_correos, ver Procfile) los manda con este backend.
 EMAIL_BACKEND = "usuarios.email_backend.SendGridEmailBackend"
 
 # --------------------------------------------------
@@ -0,0 +1,63 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from citas.models import Cita
+from core.horario_utils import recalcular_cargas
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa a completada las citas confirmadas que ya terminaron (fecha_hora + duracion "
+        "antes de ahora) con UPDATE por lotes de a lo más --lote filas, cada uno en su "
+        "propia transacción corta. Memoria constante; se puede correr en cualquier momento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Citas por UPDATE")
+        parser.add_argument("--simular", action="store_true", help="Solo cuenta, no modifica nada")
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        # Las que empezaron antes del corte ya terminaron (duracion <= MAX_DURACION):
+        # basta el índice (estado, fecha_hora), sin calcular el fin de cada una
+        corte = ahora - timedelta(minutes=Cita.MAX_DURACION)
+        terminadas = Cita.objects.filter(estado='confirmada', fecha_hora__lte=corte)
+        # Las del último tramo se revisan una por una (a lo más MAX_DURACION minutos de citas)
+        recientes = [
+            cita_id
+            for cita_id, fecha_hora, duracion in (Cita.objects
+                                                  .filter(estado='confirmada', fecha_hora__gt=corte, fecha_hora__lt=ahora)
+                                                  .values_list('id', 'fecha_hora', 'duracion'))
+            if fecha_hora + timedelta(minutes=duracion) <= ahora
+        ]
+
+        if options["simular"]:
+            self.stdout.write(f"Citas por completar: {terminadas.count() + len(recientes)}")
+            return
+
+        inicio = time.perf_counter()
+        completadas = lotes = 0
+        while True:
+            # UPDATE ... WHERE id IN (SELECT id ... LIMIT n): las completadas salen
+            # del filtro, así que cada vuelta toma las siguientes sin cursor
+            lote = terminadas.order_by('fecha_hora', 'id').values('id')[:options["lote"]]
+            n = Cita.objects.filter(estado='confirmada', id__in=lote).update(estado='completada')
+            if not n:
+                break
+            completadas += n
+            lotes += 1
+
+        if recientes:
+            completadas += Cita.objects.filter(estado='confirmada', id__in=recientes).update(estado='completada')
+            lotes += 1
+
+        if completadas:
+            # Tarotista.carga solo cuenta citas por venir: se corrige de una vez
+            recalcular_cargas()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Citas completadas: {completadas} en {lotes} lotes ({time.perf_counter() - inicio:.2f} s)"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from citas.recordatorio_utils import LOTE, enviar_recordatorios, horas_recordatorio, por_recordar
+
+
+class Command(BaseCommand):
+    help = (
+        "Encola el recordatorio de las citas confirmadas que empiezan dentro de las "
+        "próximas horas (por defecto settings.RECORDATORIO_HORAS). Cada cita se marca "
+        "al encolar su correo, así que se puede correr seguido desde cron sin repetir "
+        "envíos; los correos salen con enviar_correos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--horas", type=int, default=None, help="Ventana hacia adelante")
+        parser.add_argument("--lote", type=int, default=LOTE, help="Citas por transacción")
+        parser.add_argument("--simular", action="store_true", help="Solo cuenta, no modifica nada")
+
+    def handle(self, *args, **options):
+        horas = options["horas"] or horas_recordatorio()
+
+        if options["simular"]:
+            self.stdout.write(f"Citas por recordar: {por_recordar(timezone.now(), horas).count()}")
+            return
+
+        total = enviar_recordatorios(horas=horas, tamano=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"Recordatorios encolados: {total} (próximas {horas} h)"))
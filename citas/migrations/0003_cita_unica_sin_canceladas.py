@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0002_cita_servicio'),
+        ('tarotistas', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='cita',
+            name='unique_cita_tarotista_fecha',
+        ),
+        migrations.AddConstraint(
+            model_name='cita',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'cancelada'), _negated=True), fields=('tarotista', 'fecha_hora'), name='unique_cita_tarotista_fecha'),
+        ),
+    ]
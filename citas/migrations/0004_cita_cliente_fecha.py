@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0003_cita_unica_sin_canceladas'),
+        ('tarotistas', '0002_tarotista_carga'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['cliente', 'fecha_hora'], name='citas_cita_cliente_78599d_idx'),
+        ),
+    ]
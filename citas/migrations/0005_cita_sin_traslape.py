@@ -0,0 +1,152 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:29
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+# Rango de cada cita: [fecha_hora, fecha_hora + duracion). En PostgreSQL una
+# restricción de exclusión GiST (btree_gist para el "=" de tarotista) lo revisa
+# en el índice; la expresión va en UTC sin zona para que sea IMMUTABLE.
+POSTGRES_CREAR = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    ALTER TABLE citas_cita ADD CONSTRAINT cita_sin_traslape EXCLUDE USING gist (
+        tarotista_id WITH =,
+        tsrange(
+            fecha_hora AT TIME ZONE 'UTC',
+            (fecha_hora AT TIME ZONE 'UTC') + duracion * interval '1 minute'
+        ) WITH &&
+    ) WHERE (estado <> 'cancelada')
+    """,
+]
+POSTGRES_BORRAR = ["ALTER TABLE citas_cita DROP CONSTRAINT IF EXISTS cita_sin_traslape"]
+
+# En SQLite, triggers que buscan un traslape en el índice (tarotista, fecha_hora)
+# acotado por la duración máxima (240, restricción cita_duracion_valida).
+# SQLite tiene un solo escritor a la vez: la revisión y el INSERT no se intercalan.
+# Ojo: una migración que rehaga la tabla en SQLite (p.ej. AddField no nulo) borra
+# los triggers; esa migración debe volver a crearlos con crear_restriccion_traslape.
+TRASLAPE_SQLITE = """
+    SELECT RAISE(ABORT, 'cita_sin_traslape: la tarotista ya tiene una cita en ese horario')
+    WHERE EXISTS (
+        SELECT 1 FROM citas_cita c
+        WHERE c.tarotista_id = NEW.tarotista_id
+          AND c.estado <> 'cancelada'
+          AND c.id IS NOT NEW.id
+          AND c.fecha_hora > datetime(NEW.fecha_hora, '-240 minutes')
+          AND c.fecha_hora < datetime(NEW.fecha_hora, '+' || NEW.duracion || ' minutes')
+          AND datetime(c.fecha_hora, '+' || c.duracion || ' minutes') > NEW.fecha_hora
+    );
+"""
+SQLITE_CREAR = [
+    f"""
+    CREATE TRIGGER cita_sin_traslape_insert BEFORE INSERT ON citas_cita
+    WHEN NEW.estado <> 'cancelada'
+    BEGIN {TRASLAPE_SQLITE} END
+    """,
+    # Solo cuando cambia el rango o la tarotista, o cuando una cita cancelada vuelve
+    # a estar vigente: pasar de confirmada a completada no mueve el rango
+    f"""
+    CREATE TRIGGER cita_sin_traslape_update
+    BEFORE UPDATE OF tarotista_id, fecha_hora, duracion, estado ON citas_cita
+    WHEN NEW.estado <> 'cancelada' AND (
+        OLD.estado = 'cancelada'
+        OR NEW.tarotista_id IS NOT OLD.tarotista_id
+        OR NEW.fecha_hora IS NOT OLD.fecha_hora
+        OR NEW.duracion IS NOT OLD.duracion
+    )
+    BEGIN {TRASLAPE_SQLITE} END
+    """,
+]
+SQLITE_BORRAR = [
+    "DROP TRIGGER IF EXISTS cita_sin_traslape_insert",
+    "DROP TRIGGER IF EXISTS cita_sin_traslape_update",
+]
+
+
+def resolver_traslapes_existentes(apps, schema_editor):
+    """
+    Deja los datos en condiciones de recibir las restricciones: acota duracion
+    a 1..240 y, de cada grupo de citas vigentes que se cruzan en la misma
+    tarotista, conserva la primera (por fecha_hora, id) y cancela las demás,
+    liberando sus horarios y anotando con cuál chocaban.
+    """
+    Cita = apps.get_model('citas', 'Cita')
+    Horario = apps.get_model('core', 'Horario')
+    Tarotista = apps.get_model('tarotistas', 'Tarotista')
+
+    Cita.objects.filter(duracion__lt=1).update(duracion=1)
+    Cita.objects.filter(duracion__gt=240).update(duracion=240)
+
+    # Las conservadas no se cruzan entre sí: basta comparar con la última
+    choques = {}
+    tarotistas = set()
+    ultima = None  # (tarotista_id, fin, id)
+    for cita_id, tarotista_id, fecha_hora, duracion in (Cita.objects
+                                                        .exclude(estado='cancelada')
+                                                        .order_by('tarotista_id', 'fecha_hora', 'id')
+                                                        .values_list('id', 'tarotista_id', 'fecha_hora', 'duracion')
+                                                        .iterator()):
+        if ultima and ultima[0] == tarotista_id and fecha_hora < ultima[1]:
+            choques[cita_id] = ultima[2]
+            tarotistas.add(tarotista_id)
+        else:
+            ultima = (tarotista_id, fecha_hora + timedelta(minutes=duracion), cita_id)
+
+    for cita in Cita.objects.filter(id__in=choques).only('id', 'notas'):
+        nota = f"Cancelada al migrar: se cruzaba con la cita #{choques[cita.id]}."
+        Cita.objects.filter(id=cita.id).update(
+            estado='cancelada', notas=f"{cita.notas}\n\n{nota}" if cita.notas else nota,
+        )
+    Horario.objects.filter(cita_id__in=choques).update(reservado=False, cita=None)
+
+    # Tarotista.carga cuenta las citas próximas activas (tarotistas.0002)
+    activas = Q(citas_tarotista__estado__in=['pendiente', 'confirmada'],
+                citas_tarotista__fecha_hora__gte=timezone.now())
+    for tarotista_id, carga in (Tarotista.objects
+                                .filter(id__in=tarotistas)
+                                .annotate(n=Count('citas_tarotista', filter=activas))
+                                .values_list('id', 'n')):
+        Tarotista.objects.filter(id=tarotista_id).update(carga=carga)
+
+    if schema_editor.connection.vendor == 'postgresql':
+        # Dispara ya los triggers diferidos de las FK: PostgreSQL no deja hacer
+        # ALTER TABLE con eventos pendientes en la misma transacción
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+def _ejecutar(schema_editor, por_motor):
+    for sql in por_motor.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def crear_restriccion_traslape(apps, schema_editor):
+    _ejecutar(schema_editor, {'postgresql': POSTGRES_CREAR, 'sqlite': SQLITE_CREAR})
+
+
+def borrar_restriccion_traslape(apps, schema_editor):
+    _ejecutar(schema_editor, {'postgresql': POSTGRES_BORRAR, 'sqlite': SQLITE_BORRAR})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0004_cita_cliente_fecha'),
+        ('core', '0003_horario'),
+        ('tarotistas', '0002_tarotista_carga'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Antes de las restricciones: los datos antiguos pueden traer traslapes
+        migrations.RunPython(resolver_traslapes_existentes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cita',
+            constraint=models.CheckConstraint(condition=models.Q(('duracion__gte', 1), ('duracion__lte', 240)), name='cita_duracion_valida'),
+        ),
+        migrations.RunPython(crear_restriccion_traslape, borrar_restriccion_traslape),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0005_cita_sin_traslape'),
+        ('tarotistas', '0002_tarotista_carga'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='recordada_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['estado', 'fecha_hora'], name='citas_cita_estado_50acb3_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -12,6 +14,16 @@ class Cita(models.Model):
         ('amor', 'Tarot del Amor'),
         ('karmico', 'Tarot Kármico'),
     ]
+    # Minutos de cada servicio: los que duran más que un bloque de horario
+    # reservan varios bloques seguidos (ver core.horario_utils.reservar)
+    DURACION_SERVICIO = {
+        'basico': 30,
+        'completo': 60,
+        'amor': 30,
+        'karmico': 30,
+    }
+    # Tope de duración (también en la BD): acota la búsqueda de traslapes en el índice
+    MAX_DURACION = 240
 
     servicio = models.CharField(max_length=20, choices=SERVICIOS, default='basico')
     ESTADOS = [
@@ -36,25 +48,59 @@ class Cita(models.Model):
     estado = models.CharField(max_length=10, choices=ESTADOS, default='pendiente')
     notas = models.TextField(blank=True)
     creada_en = models.DateTimeField(auto_now_add=True)
+    # Cuándo se encoló el recordatorio (ver citas.recordatorio_utils); NULL = pendiente
+    recordada_en = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-fecha_hora']
         indexes = [
             models.Index(fields=['tarotista', 'fecha_hora']),
+            models.Index(fields=['cliente', 'fecha_hora']),
+            models.Index(fields=['estado', 'fecha_hora']),
         ]
         constraints = [
+            # Una cita cancelada no ocupa la hora: se puede volver a reservar
             models.UniqueConstraint(
                 fields=['tarotista', 'fecha_hora'],
+                condition=~models.Q(estado='cancelada'),
                 name='unique_cita_tarotista_fecha'
-            )
+            ),
+            models.CheckConstraint(
+                condition=models.Q(duracion__gte=1, duracion__lte=240),
+                name='cita_duracion_valida'
+            ),
+            # Los traslapes de [fecha_hora, fecha_hora + duracion) los impide la BD:
+            # restricción de exclusión en PostgreSQL o triggers en SQLite
+            # (migración 0005_cita_sin_traslape)
         ]
 
     def clean(self):
+        if self.fecha_hora is None:
+            return
+
         if self.fecha_hora < timezone.now():
             raise ValidationError("No se pueden crear citas en el pasado.")
 
-        if self.duracion <= 0 or self.duracion > 240:
-            raise ValidationError("La duración debe ser entre 1 y 240 minutos.")
+        if self.duracion <= 0 or self.duracion > self.MAX_DURACION:
+            raise ValidationError(f"La duración debe ser entre 1 y {self.MAX_DURACION} minutos.")
+
+        if self.tarotista_id and self.estado != 'cancelada' and self.traslapes():
+            raise ValidationError("La tarotista ya tiene una cita en ese horario.")
+
+    def traslapes(self):
+        """
+        Citas vigentes de la misma tarotista cuyo rango se cruza con el de esta.
+        Solo recorre el tramo (fecha_hora - MAX_DURACION, fin) del índice
+        (tarotista, fecha_hora), no todas las citas de la tarotista.
+        """
+        fin = self.fecha_hora + timedelta(minutes=self.duracion)
+        candidatas = (Cita.objects
+                      .filter(tarotista_id=self.tarotista_id,
+                              fecha_hora__gt=self.fecha_hora - timedelta(minutes=self.MAX_DURACION),
+                              fecha_hora__lt=fin)
+                      .exclude(estado='cancelada')
+                      .exclude(pk=self.pk))
+        return [c for c in candidatas if c.fecha_hora + timedelta(minutes=c.duracion) > self.fecha_hora]
 
     def __str__(self):
         return f"Cita #{self.id} | {self.cliente} → {self.tarotista} | {self.fecha_hora}"
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+
+POR_PAGINA = 20
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSEGUNDO = timedelta(microseconds=1)
+
+
+def codificar_cursor(cita) -> str:
+    """
+    Cursor opaco de la última cita mostrada: microsegundos epoch + id. Se
+    calcula con enteros (timedelta // 1 µs), no con timestamp() en float, que
+    puede correrse un microsegundo y saltar o repetir una cita entre páginas.
+    """
+    return f"{(cita.fecha_hora - EPOCA) // MICROSEGUNDO}-{cita.id}"
+
+
+def leer_cursor(valor):
+    """(fecha_hora, id) del cursor, o None si falta o no es válido."""
+    try:
+        micros, cita_id = (valor or "").rsplit("-", 1)
+        return EPOCA + int(micros) * MICROSEGUNDO, int(cita_id)
+    except (ValueError, OverflowError):
+        return None
+
+
+def pagina(citas, cursor=None, descendente=False, por_pagina=POR_PAGINA):
+    """
+    Una página de `citas` ordenada por (fecha_hora, id), después del cursor.
+    Usa el índice (tarotista|cliente, fecha_hora) en vez de OFFSET: cada
+    página cuesta lo mismo sin importar cuántas citas haya antes.
+    Retorna (lista, cursor de la página siguiente o None).
+    """
+    orden = ("-fecha_hora", "-id") if descendente else ("fecha_hora", "id")
+    citas = citas.order_by(*orden)
+
+    posicion = leer_cursor(cursor)
+    if posicion is not None:
+        fecha_hora, cita_id = posicion
+        if descendente:
+            citas = citas.filter(Q(fecha_hora__lt=fecha_hora) | Q(fecha_hora=fecha_hora, id__lt=cita_id))
+        else:
+            citas = citas.filter(Q(fecha_hora__gt=fecha_hora) | Q(fecha_hora=fecha_hora, id__gt=cita_id))
+
+    # Una de más para saber si hay página siguiente sin contar
+    filas = list(citas[:por_pagina + 1])
+    siguiente = codificar_cursor(filas[por_pagina - 1]) if len(filas) > por_pagina else None
+    return filas[:por_pagina], siguiente
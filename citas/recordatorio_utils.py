@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from usuarios.correo_utils import correo, encolar
+from .models import Cita
+
+
+LOTE = 200
+
+
+def horas_recordatorio() -> int:
+    return int(getattr(settings, "RECORDATORIO_HORAS", 24))
+
+
+def por_recordar(ahora, horas):
+    """Citas confirmadas que empiezan dentro de las próximas `horas` y aún no se recuerdan."""
+    return Cita.objects.filter(
+        estado='confirmada',
+        fecha_hora__gte=ahora,
+        fecha_hora__lt=ahora + timedelta(hours=horas),
+        recordada_en__isnull=True,
+    )
+
+
+def _correo_recordatorio(cita):
+    cliente = cita.cliente
+    tarotista = cita.tarotista.usuario
+    return correo(
+        cliente.email,
+        'Recordatorio de tu cita en Brujitas',
+        f"Hola {cliente.get_full_name() or cliente.username},\n\n"
+        f"Te recordamos tu cita con {tarotista.get_full_name() or tarotista.username} el "
+        f"{timezone.localtime(cita.fecha_hora).strftime('%d/%m/%Y %H:%M')} "
+        f"({cita.get_servicio_display()}, {cita.duracion} minutos).\n\n"
+        f"Si no puedes asistir, cancélala desde Mis Citas para que otra persona pueda tomar la hora.\n\n"
+        f"Gracias por confiar en Brujitas.",
+    )
+
+
+def recordar(ids):
+    """
+    Marca las citas `ids` que siguen sin recordar con un solo UPDATE condicional
+    y encola sus correos con un solo INSERT, en la misma transacción: una cita
+    queda marcada si y solo si su correo quedó en el outbox. Las que otro
+    proceso marcó entremedio no se toman aquí. Retorna cuántas se recordaron.
+    """
+    # La marca de este lote: el instante exacto con que se hace el UPDATE
+    marca = timezone.now()
+    with transaction.atomic():
+        Cita.objects.filter(id__in=ids, recordada_en__isnull=True).update(recordada_en=marca)
+        citas = list(Cita.objects
+                     .filter(id__in=ids, recordada_en=marca)
+                     .select_related('cliente', 'tarotista__usuario'))
+        encolar(*[_correo_recordatorio(c) for c in citas])
+    return len(citas)
+
+
+def enviar_recordatorios(horas=None, tamano=LOTE):
+    """
+    Recuerda todas las citas de la ventana, de a `tamano` por transacción.
+    Cada lote sale de la consulta al quedar marcado (por este u otro proceso),
+    así que volver a correrlo no repite correos. Retorna cuántas se recordaron.
+    """
+    horas = horas or horas_recordatorio()
+    ahora = timezone.now()
+    total = 0
+    while True:
+        ids = list(por_recordar(ahora, horas)
+                   .order_by('fecha_hora', 'id')
+                   .values_list('id', flat=True)[:tamano])
+        if not ids:
+            return total
+        total += recordar(ids)
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from citas.models import Cita
+from tarotistas.models import Tarotista
+from usuarios.models import Usuario
+
+
+class CitaSinTraslapeTests(TestCase):
+    """La BD rechaza dos citas vigentes de la misma tarotista que se cruzan."""
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user('tarotista', 'tarotista@example.com', 'x', es_tarotista=True)
+        self.tarotista = Tarotista.objects.create(usuario=usuario, descripcion='Prueba')
+        self.cliente = Usuario.objects.create_user('ana', 'ana@example.com', 'x')
+        self.inicio = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        self.cita = self.crear_cita(self.inicio, 60)
+
+    def crear_cita(self, fecha_hora, duracion, **datos):
+        return Cita.objects.create(
+            cliente=self.cliente, tarotista=self.tarotista,
+            fecha_hora=fecha_hora, duracion=duracion, **datos
+        )
+
+    def test_cita_que_se_cruza_no_se_inserta(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.crear_cita(self.inicio + timedelta(minutes=30), 60)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.crear_cita(self.inicio - timedelta(minutes=30), 120)
+        self.assertEqual(Cita.objects.count(), 1)
+
+    def test_citas_seguidas_no_se_cruzan(self):
+        self.crear_cita(self.inicio + timedelta(minutes=60), 30)
+        self.crear_cita(self.inicio - timedelta(minutes=30), 30)
+        self.assertEqual(Cita.objects.count(), 3)
+
+    def test_cita_cancelada_no_ocupa_el_horario(self):
+        self.crear_cita(self.inicio + timedelta(minutes=15), 30, estado='cancelada')
+        self.cita.estado = 'cancelada'
+        self.cita.save(update_fields=['estado'])
+
+        self.crear_cita(self.inicio + timedelta(minutes=15), 30)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            # Volver a dejarla vigente también se revisa
+            Cita.objects.filter(id=self.cita.id).update(estado='pendiente')
+
+
+class AgendarCitaTests(TestCase):
+    """El calendario abre el stream SSE solo si el servidor es ASGI."""
+
+    def setUp(self):
+        self.cliente = Usuario.objects.create_user('ana', 'ana@example.com', 'x')
+
+    def test_bajo_wsgi_pide_los_cambios_periodicamente(self):
+        self.client.force_login(self.cliente)
+        respuesta = self.client.get('/citas/agendar/', secure=True)
+        self.assertContains(respuesta, 'const streamEnVivo = false;')
+        self.assertEqual(self.client.get('/calendario/horarios/stream/', secure=True).status_code, 204)
+
+    async def test_bajo_asgi_abre_el_stream(self):
+        await self.async_client.aforce_login(self.cliente)
+        respuesta = await self.async_client.get('/citas/agendar/', secure=True)
+        self.assertContains(respuesta, 'const streamEnVivo = true;')
@@ -1,9 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 
+from core.horario_utils import cancelar_cita, reprogramar_cita
+from core.stream_utils import stream_disponible
 from .forms import CitaForm
 from .models import Cita
+from .paginacion_utils import pagina
 
 
 @login_required
@@ -14,12 +19,9 @@ def agendar_cita(request):
             cita = form.save(commit=False)
             cita.cliente = request.user
             cita.estado = "pendiente"
-            cita.save()
 
-            # Enviar correo de confirmación
-            from django.core.mail import send_mail
-            from django.conf import settings
-            from django.utils import timezone
+            # Correo de confirmación: queda en el outbox en la misma transacción
+            from usuarios.correo_utils import correo, encolar
 
             # Nombre tarotista (modelo Tarotista tiene relación .usuario)
             tarotista_nombre = (
@@ -34,7 +36,7 @@ def agendar_cita(request):
                     fecha_hora, timezone.get_current_timezone()
                 )
 
-            fecha = fecha_hora.strftime("%d/%m/%Y %H:%M")
+            fecha = timezone.localtime(fecha_hora).strftime("%d/%m/%Y %H:%M")
 
             servicio = getattr(cita, "servicio", "Consulta")
 
@@ -48,18 +50,28 @@ def agendar_cita(request):
                 "Gracias por confiar en Brujitas."
             )
 
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [request.user.email])
-
-            messages.success(
-                request,
-                "Tu cita fue agendada correctamente. "
-                "Se ha enviado un correo de confirmación.",
-            )
-            return redirect("citas:mis_citas")
+            try:
+                with transaction.atomic():
+                    cita.save()
+                    encolar(correo(request.user.email, subject, message))
+            except IntegrityError:
+                # Otra cita que se cruza entró después de validar el formulario (la BD lo impide)
+                form.add_error("fecha_hora", "La tarotista ya tiene una cita en ese horario.")
+            else:
+                messages.success(
+                    request,
+                    "Tu cita fue agendada correctamente. "
+                    "Se ha enviado un correo de confirmación.",
+                )
+                return redirect("citas:mis_citas")
     else:
         form = CitaForm()
 
-    return render(request, "agendar_cita.html", {"form": form})
+    return render(request, "agendar_cita.html", {
+        "form": form,
+        # Sin ASGI no hay SSE: el calendario pide los cambios cada cierto tiempo
+        "stream_en_vivo": stream_disponible(request),
+    })
 
 
 @login_required
@@ -68,26 +80,54 @@ def mis_citas(request):
     Muestra las citas del usuario.
     - Si es tarotista: citas donde ella es la tarotista.
     - Si es clienta: citas donde ella es la cliente.
-    Todas ordenadas desde la más próxima (fecha_hora ascendente).
+    Próximas (desde la más cercana) y pasadas (desde la más reciente) se paginan
+    por separado con cursores ?proximas= y ?pasadas= (ver paginacion_utils).
     """
     user = request.user
 
     if getattr(user, "es_tarotista", False):
         # Citas donde la tarotista asociada a este usuario atiende
-        citas = (
-            Cita.objects
-            .filter(tarotista__usuario=user)
-            .order_by("fecha_hora")
-        )
+        citas = Cita.objects.filter(tarotista__usuario=user)
     else:
         # Citas donde el usuario es cliente
-        citas = (
-            Cita.objects
-            .filter(cliente=user)
-            .order_by("fecha_hora")
-        )
-
-    return render(request, "mis_citas.html", {"citas": citas})
+        citas = Cita.objects.filter(cliente=user)
+
+    # Tarotista y cliente vienen en la misma consulta (la tabla los muestra por fila)
+    citas = citas.select_related("tarotista__usuario", "cliente")
+    ahora = timezone.now()
+
+    proximas, siguiente_proximas = pagina(
+        citas.filter(fecha_hora__gte=ahora), request.GET.get("proximas")
+    )
+    pasadas, siguiente_pasadas = pagina(
+        citas.filter(fecha_hora__lt=ahora), request.GET.get("pasadas"), descendente=True
+    )
+
+    grupos = [
+        {
+            "titulo": "Próximas",
+            "citas": proximas,
+            "param": "proximas",
+            "siguiente": siguiente_proximas,
+        },
+        {
+            "titulo": "Pasadas",
+            "citas": pasadas,
+            "param": "pasadas",
+            "siguiente": siguiente_pasadas,
+        },
+    ]
+    # Cada "Ver más" avanza su lista y conserva la posición de la otra
+    for grupo in grupos:
+        if grupo["siguiente"]:
+            params = request.GET.copy()
+            params[grupo["param"]] = grupo["siguiente"]
+            grupo["url_siguiente"] = "?" + params.urlencode()
+
+    return render(request, "mis_citas.html", {
+        "grupos": grupos,
+        "hay_citas": bool(proximas or pasadas or request.GET),
+    })
 
 
 @login_required
@@ -109,8 +149,26 @@ def editar_cita(request, cita_id):
     if request.method == "POST":
         form = CitaForm(request.POST, instance=cita)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Tu cita ha sido actualizada correctamente.")
+            if "fecha_hora" in form.changed_data:
+                # Nueva hora: el recordatorio se vuelve a enviar para esa hora
+                form.instance.recordada_en = None
+            # Una cita reservada por el calendario se mueve junto con sus horarios
+            mover = ({"fecha_hora", "tarotista"} & set(form.changed_data)
+                     and cita.horarios.filter(reservado=True).exists())
+            error = None
+            try:
+                with transaction.atomic():
+                    if not mover:
+                        form.save()
+                    elif not reprogramar_cita(form.save(commit=False)):
+                        error = f"No quedan {cita.duracion} minutos seguidos libres desde esa hora."
+            except IntegrityError:
+                error = "La tarotista ya tiene una cita en ese horario."
+
+            if error:
+                messages.error(request, f"No se pudo cambiar la cita: {error}")
+            else:
+                messages.success(request, "Tu cita ha sido actualizada correctamente.")
             return redirect("citas:mis_citas")
     else:
         form = CitaForm(instance=cita)
@@ -122,11 +180,12 @@ def editar_cita(request, cita_id):
 def eliminar_cita(request, cita_id):
     """
     Permite al usuario eliminar una cita que él haya agendado.
+    Sus horarios vuelven a quedar libres en la misma transacción.
     """
     cita = get_object_or_404(Cita, id=cita_id, cliente=request.user)
 
     if request.method == "POST":
-        cita.delete()
+        cancelar_cita(cita, eliminar=True)
         messages.success(request, "Tu cita ha sido eliminada correctamente.")
         return redirect("citas:mis_citas")
 
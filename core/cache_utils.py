@@ -0,0 +1,64 @@
+import hashlib
+import time
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import VersionCalendario
+
+
+SNAPSHOT_TIMEOUT = 600  # 10 min (igual se invalida al cambiar la versión)
+
+
+def version_disponibilidad() -> int:
+    """
+    Versión actual de los datos del calendario (Disponibilidad + Horario + Cita).
+    Se lee de la BD (una fila, por clave primaria) y no de la caché: la caché
+    es por proceso y los cambios del cron o del worker no la tocarían.
+    """
+    version = VersionCalendario.objects.filter(id=1).values_list('valor', flat=True).first()
+    if version is None:
+        version = VersionCalendario.objects.get_or_create(
+            id=1, defaults={'valor': int(time.time() * 1000)}
+        )[0].valor
+    return version
+
+
+def version_de(request) -> int:
+    """
+    version_disponibilidad() leída una sola vez por petición: el ETag, las
+    retenciones y el snapshot del feed usan la misma. Leerla antes que los
+    datos asegura que un snapshot nunca quede bajo una versión más nueva que él.
+    """
+    if not hasattr(request, '_version_calendario'):
+        request._version_calendario = version_disponibilidad()
+    return request._version_calendario
+
+
+def invalidar_disponibilidad():
+    """
+    Sube la versión del calendario cuando se confirma la transacción actual,
+    así nadie cachea un snapshot viejo bajo la versión nueva. Es un UPDATE
+    corto fuera de la transacción del cambio: no alarga sus bloqueos.
+    """
+    def _bump():
+        if not VersionCalendario.objects.filter(id=1).update(valor=F('valor') + 1):
+            version_disponibilidad()
+
+    transaction.on_commit(_bump)
+
+
+def snapshot_key(nombre: str, *partes, version=None) -> str:
+    if version is None:
+        version = version_disponibilidad()
+    return ":".join(["disponibilidad", nombre, str(version), *map(str, partes)])
+
+
+def etag_disponibilidad(request, *extra) -> str:
+    """
+    ETag del feed: versión + URL pedida + usuario (los ocupados son privados),
+    más lo que cambie sin subir la versión (p.ej. retenciones que vencen).
+    """
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    raw = f"{version_de(request)}:{request.get_full_path()}:{user_id}:{extra}"
+    return hashlib.md5(raw.encode()).hexdigest()
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import CambioHorario
+
+
+# Sobre este número de cambios pendientes conviene mandar el snapshot completo
+MAX_CAMBIOS = 500
+# Una transacción en curso puede confirmar después un id menor al último visible;
+# por eso el cursor que se entrega solo llega a cambios con esta antigüedad
+# (los más nuevos se reenvían y el cliente los vuelve a aplicar sin efecto).
+MARGEN_CURSOR_SEGUNDOS = 60
+RETENCION_DIAS = 7
+
+
+def registrar_cambios(tipo, horarios):
+    """Agrega al registro un cambio `tipo` por cada Horario (con id) de la lista."""
+    CambioHorario.objects.bulk_create([
+        CambioHorario(
+            tipo=tipo,
+            horario_id=h.id,
+            tarotista_id=h.tarotista_id,
+            inicio=h.inicio,
+            fin=h.fin,
+        )
+        for h in horarios
+    ])
+
+
+def cursor_actual() -> int:
+    """Último número de secuencia que ya no puede quedar detrás de otro por confirmar."""
+    limite = timezone.now() - timedelta(seconds=MARGEN_CURSOR_SEGUNDOS)
+    ultimo = (CambioHorario.objects
+              .filter(creado__lte=limite)
+              .order_by('-id')
+              .values_list('id', flat=True)
+              .first())
+    return ultimo or 0
+
+
+def cambios_desde(cursor, rango):
+    """
+    Cambios con id > cursor cuyos horarios caen en `rango` (Q sobre inicio), en orden.
+    Retorna None si el cliente debe recargar todo: el cursor es anterior a lo
+    que ya se podó o hay más de MAX_CAMBIOS pendientes.
+    """
+    primero = CambioHorario.objects.aggregate(primero=Min('id'))['primero']
+    if primero is not None and cursor < primero - 1:
+        return None
+
+    cambios = list(CambioHorario.objects.filter(rango, id__gt=cursor)[:MAX_CAMBIOS + 1])
+    if len(cambios) > MAX_CAMBIOS:
+        return None
+    return cambios
+
+
+def podar_cambios(dias=RETENCION_DIAS) -> int:
+    """
+    Borra los cambios más antiguos que `dias`. Se conserva siempre el último
+    para que los cursores al día no parezcan vencidos. Retorna cuántos se borraron.
+    """
+    ultimo = CambioHorario.objects.order_by('-id').values_list('id', flat=True).first()
+    limite = timezone.now() - timedelta(days=dias)
+    borrados, _ = CambioHorario.objects.filter(creado__lt=limite).exclude(id=ultimo).delete()
+    return borrados
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from usuarios.correo_utils import correo, encolar
+from .cache_utils import invalidar_disponibilidad
+from .models import EsperaHorario, Horario
+from .stream_utils import publicar
+
+
+def minutos_promocion() -> int:
+    return int(getattr(settings, "ESPERA_RETENCION_MINUTOS", 30))
+
+
+def primero_en_espera(tarotista_id, fecha):
+    """El primero de la fila (una lectura del índice tarotista, fecha, creado)."""
+    return (EsperaHorario.objects
+            .filter(tarotista_id=tarotista_id, fecha=fecha)
+            .select_related('usuario', 'tarotista__usuario')
+            .order_by('creado', 'id')
+            .first())
+
+
+def posicion(espera):
+    """Lugar en la fila (1 = el próximo en ser promovido)."""
+    antes = (Q(creado__lt=espera.creado)
+             | Q(creado=espera.creado, id__lt=espera.id))
+    return EsperaHorario.objects.filter(antes, tarotista_id=espera.tarotista_id, fecha=espera.fecha).count() + 1
+
+
+def _correo_promocion(espera, horario, hasta):
+    usuario = espera.usuario
+    tarotista = espera.tarotista
+    tarotista_nombre = tarotista.usuario.get_full_name() or tarotista.usuario.username
+    return correo(
+        usuario.email,
+        'Se liberó una hora que esperabas',
+        f"Hola {usuario.get_full_name() or usuario.username},\n\n"
+        f"Se liberó una hora con {tarotista_nombre} el "
+        f"{timezone.localtime(horario.inicio).strftime('%d/%m/%Y %H:%M')}.\n"
+        f"La apartamos para ti hasta las {timezone.localtime(hasta).strftime('%H:%M')}; "
+        f"entra a Agendar Cita para confirmarla.\n\n"
+        f"Gracias por confiar en Brujitas.",
+    )
+
+
+def promover_esperas(horarios):
+    """
+    Por cada horario liberado, el primero en espera de esa tarotista y día
+    recibe una retención de ESPERA_RETENCION_MINUTOS (UPDATE condicional: el
+    horario debe seguir libre, futuro y sin retención vigente) y sale de la
+    fila. Los avisos se encolan juntos en el outbox. Retorna cuántos se promovieron.
+    """
+    ahora = timezone.now()
+    hasta = ahora + timedelta(minutes=minutos_promocion())
+    correos = []
+
+    with transaction.atomic():
+        for horario in horarios:
+            if horario.inicio < ahora:
+                continue
+            espera = primero_en_espera(horario.tarotista_id, timezone.localdate(horario.inicio))
+            if espera is None:
+                continue
+
+            tomados = (Horario.objects
+                       .filter(Q(retenido_hasta__isnull=True) | Q(retenido_hasta__lte=ahora),
+                               id=horario.id, reservado=False)
+                       .update(retenido_por_id=espera.usuario_id, retenido_hasta=hasta))
+            if not tomados:
+                continue
+
+            espera.delete()
+            publicar('retenido', id=horario.id, hasta=timezone.localtime(hasta).isoformat())
+            correos.append(_correo_promocion(espera, horario, hasta))
+
+        encolar(*correos)
+
+    if correos:
+        invalidar_disponibilidad()
+    return len(correos)
+
+
+def promover_vencidas():
+    """
+    Las retenciones vencen sin aviso: si la persona promovida no confirmó, el
+    horario pasa al siguiente en espera. Limpia las retenciones vencidas.
+    Corre al leer las retenciones (retencion_utils.retenciones_activas), así
+    que el traspaso ocurre con la primera visita al calendario tras el
+    vencimiento; materializar_horarios lo repite por si nadie lo visitó.
+    """
+    ahora = timezone.now()
+    vencidas = Horario.objects.filter(retenido_hasta__lte=ahora)
+    promovidos = promover_esperas(
+        vencidas.filter(reservado=False, inicio__gte=ahora).only('id', 'tarotista_id', 'inicio')
+    )
+    vencidas.update(retenido_por=None, retenido_hasta=None)
+    return promovidos
+
+
+def podar_esperas():
+    """Borra las esperas de días que ya pasaron."""
+    borradas, _ = EsperaHorario.objects.filter(fecha__lt=timezone.localdate()).delete()
+    return borradas
@@ -0,0 +1,428 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from citas.models import Cita
+from tarotistas.models import Tarotista
+from .cache_utils import invalidar_disponibilidad
+from .cambios_utils import registrar_cambios
+from .espera_utils import promover_esperas
+from .models import Disponibilidad, Horario
+from .stream_utils import publicar
+
+
+# Estados de cita que cuentan como carga de la tarotista
+ESTADOS_ACTIVOS = ('pendiente', 'confirmada')
+# Horarios que prueba la asignación automática si otros le ganan los primeros
+INTENTOS_ASIGNACION = 5
+# Ids por consulta al leer los horarios recién creados
+LOTE_IDS = 500
+
+
+def semanas_materializadas() -> int:
+    return int(getattr(settings, "HORARIOS_SEMANAS", 8))
+
+
+def fecha_hora_local(fecha, hora):
+    """datetime con zona horaria (TIME_ZONE) para una fecha y hora locales."""
+    return timezone.make_aware(datetime.combine(fecha, hora))
+
+
+def inicio_dia(fecha):
+    return fecha_hora_local(fecha, datetime.min.time())
+
+
+def ocurrencias(disponibilidad, desde, hasta):
+    """(inicio, fin) de cada fecha de [desde, hasta) que cae en el día de la regla."""
+    js_desde = (desde.weekday() + 1) % 7
+    fecha = desde + timedelta(days=(disponibilidad.dia_semana - js_desde) % 7)
+    while fecha < hasta:
+        inicio = fecha_hora_local(fecha, disponibilidad.hora_inicio)
+        fin_fecha = fecha if disponibilidad.hora_fin > disponibilidad.hora_inicio else fecha + timedelta(days=1)
+        yield inicio, fecha_hora_local(fin_fecha, disponibilidad.hora_fin)
+        fecha += timedelta(days=7)
+
+
+def _insertar_nuevos(horarios):
+    """
+    INSERT ... ON CONFLICT (disponibilidad_id, inicio) DO NOTHING RETURNING id
+    (PostgreSQL y SQLite >= 3.35): a diferencia de bulk_create(ignore_conflicts=True)
+    dice qué filas insertó esta llamada y no otro proceso que materializaba a la vez.
+    Retorna sus ids.
+    """
+    ops = connection.ops
+    campos = [Horario._meta.get_field(nombre) for nombre in ('tarotista', 'disponibilidad', 'inicio', 'fin', 'reservado')]
+    columnas = [ops.quote_name(campo.column) for campo in campos]
+    fila = f"({', '.join(['%s'] * len(campos))})"
+    ids = []
+    with connection.cursor() as cursor:
+        tamano = max(ops.bulk_batch_size(campos, horarios), 1)
+        for i in range(0, len(horarios), tamano):
+            lote = horarios[i:i + tamano]
+            cursor.execute(
+                f"INSERT INTO {ops.quote_name(Horario._meta.db_table)} ({', '.join(columnas)}) "
+                f"VALUES {', '.join([fila] * len(lote))} "
+                f"ON CONFLICT ({columnas[1]}, {columnas[2]}) "
+                f"DO NOTHING RETURNING {ops.quote_name(Horario._meta.pk.column)}",
+                [valor
+                 for h in lote
+                 for valor in (h.tarotista_id, h.disponibilidad_id,
+                               ops.adapt_datetimefield_value(h.inicio),
+                               ops.adapt_datetimefield_value(h.fin), False)],
+            )
+            ids.extend(id_ for id_, in cursor.fetchall())
+    return ids
+
+
+def materializar(disponibilidades=None, desde=None, semanas=None):
+    """
+    Crea los Horario de las reglas indicadas (todas por defecto) desde `desde`
+    hasta `semanas` semanas adelante. Es idempotente: las fechas ya creadas se
+    saltan por la restricción única (disponibilidad, inicio).
+    Retorna cuántos horarios se intentaron crear.
+    """
+    desde = desde or timezone.localdate()
+    hasta = desde + timedelta(weeks=semanas or semanas_materializadas())
+
+    if disponibilidades is None:
+        disponibilidades = Disponibilidad.objects.all().iterator()
+
+    nuevos = [
+        Horario(
+            tarotista_id=d.tarotista_id,
+            disponibilidad=d,
+            inicio=inicio,
+            fin=fin,
+        )
+        for d in disponibilidades
+        for inicio, fin in ocurrencias(d, desde, hasta)
+    ]
+
+    creados = _insertar_nuevos(nuevos) if nuevos else []
+    if creados:
+        # Sin post_save por fila: se registran solo los que insertó esta llamada
+        # (de a LOTE_IDS para no pasar el límite de parámetros de SQLite)
+        tarotista_ids = set()
+        for i in range(0, len(creados), LOTE_IDS):
+            horarios = list(Horario.objects.filter(id__in=creados[i:i + LOTE_IDS]).only(
+                'id', 'tarotista_id', 'inicio', 'fin'))
+            registrar_cambios('agregado', horarios)
+            tarotista_ids.update(h.tarotista_id for h in horarios)
+        invalidar_disponibilidad()
+        publicar('agregado', tarotista_ids=sorted(tarotista_ids))
+    return len(nuevos)
+
+
+def inicio_semana(fecha=None):
+    """Lunes 00:00 (hora local) de la semana de `fecha` (hoy por defecto)."""
+    fecha = fecha or timezone.localdate()
+    return inicio_dia(fecha - timedelta(days=fecha.weekday()))
+
+
+def podar_horarios(antes=None):
+    """
+    Borra los horarios libres que terminaron antes de `antes` (por defecto, el
+    inicio de la semana en curso): ya no se pueden reservar. Los reservados se
+    conservan junto a su cita. Es un solo DELETE por el índice (reservado,
+    inicio), sin cargar filas ni disparar señales por cada una (nadie sigue
+    horarios de semanas pasadas); repetirlo no borra nada más.
+    Retorna cuántos se borraron.
+    """
+    antes = antes or inicio_semana()
+    # QuerySet.delete() cargaría cada fila para las señales post_delete de Horario
+    limite = connection.ops.adapt_datetimefield_value(antes)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(Horario._meta.db_table)} "
+            "WHERE reservado = %s AND inicio < %s AND fin <= %s",
+            [False, limite, limite],
+        )
+        borrados = cursor.rowcount
+    if borrados:
+        invalidar_disponibilidad()
+    return borrados
+
+
+def contar_horarios(tarotista_id):
+    """(total, libres, reservados) de los horarios que aún no pasan, en una consulta."""
+    totales = (Horario.objects
+               .filter(tarotista_id=tarotista_id, inicio__gte=timezone.now())
+               .aggregate(total=Count('id'),
+                          libres=Count('id', filter=Q(reservado=False)),
+                          reservados=Count('id', filter=Q(reservado=True))))
+    return totales['total'], totales['libres'], totales['reservados']
+
+
+def datos_horario(horario):
+    """Datos de un horario para los avisos SSE."""
+    return {
+        'id': horario.id,
+        'tarotista_id': horario.tarotista_id,
+        'start': timezone.localtime(horario.inicio).isoformat(),
+        'end': timezone.localtime(horario.fin).isoformat(),
+    }
+
+
+def horarios_actualizados(tipo, horarios):
+    """
+    Lo que hacen las señales de Horario, para cambios hechos con update()
+    (que no las dispara): registro de cambios, aviso SSE, invalidación del feed
+    y promoción de la lista de espera si se liberaron.
+    """
+    registrar_cambios(tipo, horarios)
+    for horario in horarios:
+        publicar(tipo, **datos_horario(horario))
+    invalidar_disponibilidad()
+    if tipo == 'liberado':
+        promover_esperas(horarios)
+
+
+def sin_retencion_ajena(usuario, ahora):
+    """Q de los horarios que nadie más tiene retenidos (las retenciones vencidas no cuentan)."""
+    return (Q(retenido_hasta__isnull=True)
+            | Q(retenido_hasta__lte=ahora)
+            | Q(retenido_por_id=usuario.pk))
+
+
+def minutos_servicio(servicio) -> int:
+    return Cita.DURACION_SERVICIO.get(servicio, min(Cita.DURACION_SERVICIO.values()))
+
+
+def bloques_contiguos(horario, minutos):
+    """
+    Los horarios del tarotista que cubren `minutos` desde horario.inicio, uno
+    tras otro sin huecos, leídos en orden del índice (tarotista, inicio).
+    No revisa si están libres (eso lo decide el UPDATE de reservar).
+    Retorna None si la racha se corta antes.
+    """
+    hasta = horario.inicio + timedelta(minutes=minutos)
+    if horario.fin >= hasta:
+        return [horario]
+
+    bloques = []
+    siguiente = horario.inicio
+    # Si dos reglas generan la misma hora, va primero la libre
+    for h in (Horario.objects
+              .filter(tarotista_id=horario.tarotista_id, inicio__gte=horario.inicio, inicio__lt=hasta)
+              .order_by('inicio', 'reservado')):
+        if h.inicio < siguiente:
+            continue
+        if h.inicio > siguiente:
+            return None
+        bloques.append(h)
+        siguiente = h.fin
+    return bloques if siguiente >= hasta else None
+
+
+def reservar(horario, cliente, servicio):
+    """
+    Reserva el horario para el cliente sin bloquear la fila mientras se trabaja:
+    un UPDATE condicional (WHERE reservado = false) lo reclama y la Cita se crea
+    en la misma transacción corta. Si el servicio dura más que un bloque, el
+    mismo UPDATE reclama todos los bloques seguidos y, si falta alguno, se
+    revierte. Una retención vigente del cliente se convierte en la reserva; la
+    de otra persona la impide. Retorna la Cita, o None si otra persona tomó
+    algún bloque primero (o ya pasó). Los correos van después, fuera de la transacción.
+    """
+    citas = reservar_varios([horario], cliente, servicio)
+    return citas[0] if citas else None
+
+
+def reservar_varios(horarios, cliente, servicio):
+    """
+    Como reservar, para varias sesiones a la vez (p.ej. una serie semanal):
+    todos los bloques se reclaman con un solo UPDATE y las Citas se crean con
+    bulk_create. O quedan todas reservadas o ninguna. Retorna la lista de
+    Citas (en el orden de `horarios`), o None.
+    """
+    ahora = timezone.now()
+    minutos = minutos_servicio(servicio)
+
+    sesiones = []
+    for horario in horarios:
+        bloques = bloques_contiguos(horario, minutos)
+        if not bloques:
+            return None
+        sesiones.append(bloques)
+
+    ids = [h.id for bloques in sesiones for h in bloques]
+    if not ids or len(set(ids)) != len(ids):
+        # Sesiones que se pisan entre sí
+        return None
+
+    with transaction.atomic():
+        tomados = (Horario.objects
+                   .filter(sin_retencion_ajena(cliente, ahora),
+                           id__in=ids, reservado=False, inicio__gte=ahora)
+                   .update(reservado=True, retenido_por=None, retenido_hasta=None))
+        if tomados != len(ids):
+            transaction.set_rollback(True)
+            return None
+
+        try:
+            with transaction.atomic():
+                citas = Cita.objects.bulk_create([
+                    Cita(
+                        cliente=cliente,
+                        tarotista_id=bloques[0].tarotista_id,
+                        fecha_hora=bloques[0].inicio,
+                        duracion=int((bloques[-1].fin - bloques[0].inicio).total_seconds()) // 60,
+                        estado='confirmada',
+                        servicio=servicio
+                    )
+                    for bloques in sesiones
+                ])
+        except IntegrityError:
+            # Se cruza con una cita que no pasó por Horario (p.ej. agendar_cita)
+            transaction.set_rollback(True)
+            return None
+
+        Horario.objects.filter(id__in=ids).update(cita=Case(*[
+            When(id=h.id, then=Value(cita.id))
+            for cita, bloques in zip(citas, sesiones)
+            for h in bloques
+        ]))
+        for tarotista_id, n in Counter(c.tarotista_id for c in citas).items():
+            Tarotista.objects.filter(id=tarotista_id).update(carga=F('carga') + n)
+
+        for cita, bloques in zip(citas, sesiones):
+            for h in bloques:
+                h.reservado = True
+                h.cita = cita
+                h.retenido_por = h.retenido_hasta = None
+        horarios_actualizados('reservado', [h for bloques in sesiones for h in bloques])
+    return citas
+
+
+def reservar_menos_cargada(cliente, desde, hasta, servicio):
+    """
+    Modo "cualquier tarotista": entre los horarios libres que empiezan en
+    [desde, hasta) (o justo en `desde` si hasta es None), reserva el de la
+    tarotista disponible con menos carga, y a igual carga el más temprano.
+    Ordena por el contador Tarotista.carga, sin contar citas. Si otra persona
+    gana el primero, prueba los siguientes. Retorna la Cita o None.
+    """
+    ahora = timezone.now()
+    horarios = Horario.objects.filter(
+        sin_retencion_ajena(cliente, ahora),
+        reservado=False,
+        inicio__gte=max(desde, ahora),
+        tarotista__disponible=True,
+    )
+    horarios = horarios.filter(inicio__lt=hasta) if hasta else horarios.filter(inicio=desde)
+
+    for horario in horarios.order_by('tarotista__carga', 'inicio', 'id')[:INTENTOS_ASIGNACION]:
+        cita = reservar(horario, cliente, servicio)
+        if cita is not None:
+            return cita
+    return None
+
+
+def recalcular_cargas():
+    """Recalcula Tarotista.carga desde las citas (corrige desvíos del contador, p.ej. citas que ya pasaron)."""
+    activas = (Cita.objects
+               .filter(tarotista=OuterRef('pk'), estado__in=ESTADOS_ACTIVOS, fecha_hora__gte=timezone.now())
+               .order_by()
+               .values('tarotista')
+               .annotate(n=Count('id'))
+               .values('n'))
+    return Tarotista.objects.update(carga=Coalesce(Subquery(activas), 0))
+
+
+def liberar_horarios(cita):
+    """
+    Deja libres los horarios reservados por la cita (UPDATE) y avisa como
+    liberados, lo que además promueve la lista de espera. Retorna cuántos.
+    """
+    with transaction.atomic():
+        horarios = list(Horario.objects.filter(cita=cita, reservado=True))
+        if horarios:
+            Horario.objects.filter(id__in=[h.id for h in horarios]).update(reservado=False, cita=None)
+            # La carga solo cuenta citas por venir (ver recalcular_cargas)
+            if cita.fecha_hora >= timezone.now():
+                Tarotista.objects.filter(id=cita.tarotista_id, carga__gt=0).update(carga=F('carga') - 1)
+            for h in horarios:
+                h.reservado = False
+                h.cita = None
+            horarios_actualizados('liberado', horarios)
+    return len(horarios)
+
+
+def reprogramar_cita(cita):
+    """
+    Guarda el cambio de hora o de tarotista de una cita reservada por Horario
+    (`cita` ya trae los valores nuevos): reclama los bloques de la hora nueva
+    con un UPDATE condicional, como reservar (los que la cita ya tenía cuentan
+    como libres), suelta los anteriores como liberados (lo que además promueve
+    la lista de espera) y mueve la carga si cambió la tarotista, todo en una
+    transacción. Retorna False, sin cambiar nada, si en la hora nueva no
+    quedan bloques seguidos libres para la duración de la cita.
+    """
+    ahora = timezone.now()
+    horario = (Horario.objects
+               .filter(Q(reservado=False) | Q(cita=cita), tarotista_id=cita.tarotista_id, inicio=cita.fecha_hora)
+               .order_by('reservado')
+               .first())
+    bloques = bloques_contiguos(horario, cita.duracion) if horario else None
+    if not bloques:
+        return False
+    ids = [h.id for h in bloques]
+
+    with transaction.atomic():
+        tomados = (Horario.objects
+                   .filter(Q(reservado=False) | Q(cita=cita), sin_retencion_ajena(cita.cliente, ahora),
+                           id__in=ids, inicio__gte=ahora)
+                   .update(reservado=True, retenido_por=None, retenido_hasta=None))
+        if tomados != len(ids):
+            transaction.set_rollback(True)
+            return False
+
+        tarotista_anterior = Cita.objects.filter(pk=cita.pk).values_list('tarotista_id', flat=True).get()
+        try:
+            with transaction.atomic():
+                cita.save()
+        except IntegrityError:
+            # Se cruza con una cita que no pasó por Horario
+            transaction.set_rollback(True)
+            return False
+
+        anteriores = list(Horario.objects.filter(cita=cita, reservado=True).exclude(id__in=ids))
+        nuevos = [h for h in bloques if h.cita_id != cita.id]
+        Horario.objects.filter(id__in=ids).update(cita=cita)
+        if anteriores:
+            Horario.objects.filter(id__in=[h.id for h in anteriores]).update(reservado=False, cita=None)
+        if tarotista_anterior != cita.tarotista_id:
+            Tarotista.objects.filter(id=tarotista_anterior, carga__gt=0).update(carga=F('carga') - 1)
+            Tarotista.objects.filter(id=cita.tarotista_id).update(carga=F('carga') + 1)
+
+        for h in nuevos:
+            h.reservado = True
+            h.cita = cita
+            h.retenido_por = h.retenido_hasta = None
+        for h in anteriores:
+            h.reservado = False
+            h.cita = None
+        if nuevos:
+            horarios_actualizados('reservado', nuevos)
+        if anteriores:
+            horarios_actualizados('liberado', anteriores)
+    return True
+
+
+def cancelar_cita(cita, eliminar=False):
+    """
+    Cancela la cita (o la borra) y libera exactamente sus horarios, en una
+    sola transacción: o quedan ambas cosas hechas o ninguna.
+    """
+    with transaction.atomic():
+        liberar_horarios(cita)
+        if eliminar:
+            cita.delete()
+        else:
+            cita.estado = 'cancelada'
+            cita.save(update_fields=['estado'])
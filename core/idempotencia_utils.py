@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .models import ClaveIdempotencia
+
+
+MAX_LARGO_CLAVE = 100
+# Errores que no cambian al reintentar (petición inválida, horario inexistente).
+# Un 409 es pasajero (retención ajena que vence, bloques que se liberan): no se guarda
+ERRORES_DEFINITIVOS = (400, 404)
+
+
+def horas_vigencia() -> int:
+    return int(getattr(settings, "IDEMPOTENCIA_HORAS", 24))
+
+
+def _limite():
+    return timezone.now() - timedelta(hours=horas_vigencia())
+
+
+def respuesta_guardada(usuario, clave):
+    """JsonResponse guardada para la clave (una consulta por índice), o None si no hay vigente."""
+    guardada = (ClaveIdempotencia.objects
+                .filter(usuario=usuario, clave=clave, creado__gte=_limite())
+                .values_list('estado', 'respuesta')
+                .first())
+    if guardada is None:
+        return None
+
+    estado, respuesta = guardada
+    response = JsonResponse(respuesta, status=estado)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def es_definitiva(estado) -> bool:
+    """True si la respuesta se guarda para la clave: éxitos y errores definitivos."""
+    return 200 <= estado < 300 or estado in ERRORES_DEFINITIVOS
+
+
+def guardar_respuesta(usuario, clave, estado, respuesta):
+    """
+    Guarda la respuesta de la clave. Lanza IntegrityError si otra petición con
+    la misma clave la guardó primero (se debe responder la guardada).
+    """
+    # Una clave vencida se puede reutilizar
+    ClaveIdempotencia.objects.filter(usuario=usuario, clave=clave, creado__lt=_limite()).delete()
+    ClaveIdempotencia.objects.create(usuario=usuario, clave=clave, estado=estado, respuesta=respuesta)
+
+
+def podar_claves() -> int:
+    """Borra las claves vencidas. Retorna cuántas se borraron."""
+    borradas, _ = ClaveIdempotencia.objects.filter(creado__lt=_limite()).delete()
+    return borradas
@@ -0,0 +1,51 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+# Elementos serializados por cada trozo que se envía
+ELEMENTOS_POR_TROZO = 500
+
+_encoder = DjangoJSONEncoder()
+
+
+def arreglo_json(items):
+    """Genera el texto de un arreglo JSON por trozos, serializando `items` de a uno."""
+    yield '['
+    trozo = []
+    separador = ''
+    for item in items:
+        trozo.append(separador + _encoder.encode(item))
+        separador = ','
+        if len(trozo) >= ELEMENTOS_POR_TROZO:
+            yield ''.join(trozo)
+            trozo = []
+    if trozo:
+        yield ''.join(trozo)
+    yield ']'
+
+
+def objeto_json(pares):
+    """
+    Genera un objeto JSON desde pares (clave, valor) en orden. Los valores que
+    son listas o iterables se escriben con arreglo_json, y se consumen recién
+    al llegar a su clave (un valor posterior puede depender de uno anterior).
+    """
+    yield '{'
+    separador = ''
+    for clave, valor in pares:
+        yield f'{separador}{_encoder.encode(clave)}:'
+        separador = ','
+        if valor is None or isinstance(valor, (str, bytes, int, float, dict)):
+            yield _encoder.encode(valor)
+        else:
+            yield from arreglo_json(valor)
+    yield '}'
+
+
+def respuesta_json_stream(partes, status=200):
+    """
+    Respuesta JSON enviada a medida que se generan las partes.
+    Bajo WSGI (gunicorn) se transmite por partes; bajo ASGI Django junta un
+    iterador síncrono completo antes de enviarlo.
+    """
+    return StreamingHttpResponse(partes, status=status, content_type='application/json')
@@ -0,0 +1,186 @@
+import json
+import random
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.utils import timezone
+
+from citas.models import Cita
+from core.models import Horario
+from tarotistas.models import Tarotista
+from usuarios.models import Usuario
+
+
+PREFIJO = "_estres_reserva"
+URL_RESERVA = "/calendario/reservar/"
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de reservar_horario: crea tarotistas, horarios y clientes de prueba, "
+        "lanza reservas concurrentes (test client en proceso o --url de un servidor local) y "
+        "reporta throughput, latencias, tasa de 409 y reservas dobles. Borra sus datos al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clientes", type=int, default=30, help="Clientes concurrentes (uno por hilo)")
+        parser.add_argument("--peticiones", type=int, default=5, help="Reservas que intenta cada cliente")
+        parser.add_argument("--tarotistas", type=int, default=2)
+        parser.add_argument(
+            "--horarios",
+            type=int,
+            default=4,
+            help="Horarios contiguos por tarotista; 1 = todos compiten por el mismo",
+        )
+        parser.add_argument("--url", default="", help="Servidor a probar, p.ej. http://127.0.0.1:8000 (por defecto, en proceso)")
+        parser.add_argument("--semilla", type=int, default=None, help="Semilla aleatoria para repetir una corrida")
+        parser.add_argument("--conservar", action="store_true", help="No borrar los datos de prueba")
+
+    def handle(self, *args, **options):
+        azar = random.Random(options["semilla"])
+        self.stdout.write(f"Base de datos: {connection.vendor} ({settings.DATABASES['default']['NAME']})")
+
+        Usuario.objects.filter(username__startswith=PREFIJO).delete()
+        try:
+            horarios = self._crear_horarios(options["tarotistas"], options["horarios"])
+            clientes = [
+                Usuario.objects.create(username=f"{PREFIJO}_cliente_{i}")
+                for i in range(options["clientes"])
+            ]
+
+            if options["url"]:
+                enviar = self._enviar_http(options["url"].rstrip("/"))
+            else:
+                enviar = self._enviar_en_proceso()
+
+            trabajos = [
+                (enviar(cliente), [azar.choice(horarios) for _ in range(options["peticiones"])])
+                for cliente in clientes
+            ]
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=len(trabajos)) as pool:
+                resultados = [r for lote in pool.map(self._cliente, trabajos) for r in lote]
+            duracion = time.perf_counter() - inicio
+
+            self._reporte(resultados, duracion, horarios)
+        finally:
+            if not options["conservar"]:
+                Usuario.objects.filter(username__startswith=PREFIJO).delete()
+
+    def _crear_horarios(self, n_tarotistas, n_horarios):
+        # Muy en el futuro y sin regla de origen para no cruzarse con horarios reales
+        inicio = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=3650)
+        nuevos = []
+        for t in range(n_tarotistas):
+            usuario = Usuario.objects.create(username=f"{PREFIJO}_tarotista_{t}", es_tarotista=True)
+            tarotista = Tarotista.objects.create(usuario=usuario, descripcion="Prueba de carga")
+            nuevos += [
+                Horario(
+                    tarotista=tarotista,
+                    inicio=inicio + timedelta(minutes=30 * i),
+                    fin=inicio + timedelta(minutes=30 * (i + 1)),
+                )
+                for i in range(n_horarios)
+            ]
+        Horario.objects.bulk_create(nuevos)
+        return list(Horario.objects
+                    .filter(tarotista__usuario__username__startswith=PREFIJO)
+                    .values_list("id", flat=True))
+
+    def _enviar_en_proceso(self):
+        def para(cliente):
+            client = Client()
+            client.force_login(cliente)
+
+            def enviar(horario_id):
+                r = client.post(
+                    URL_RESERVA,
+                    json.dumps({"evento_id": horario_id}),
+                    content_type="application/json",
+                    secure=True,
+                    HTTP_HOST="localhost",
+                )
+                return r.status_code
+            return enviar
+        return para
+
+    def _enviar_http(self, base):
+        import requests
+
+        def para(cliente):
+            # Sesión creada directo en la BD (como Client.force_login)
+            sesion = SessionStore()
+            sesion[SESSION_KEY] = str(cliente.pk)
+            sesion[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            sesion[HASH_SESSION_KEY] = cliente.get_session_auth_hash()
+            sesion.create()
+
+            http = requests.Session()
+            http.cookies.set(settings.SESSION_COOKIE_NAME, sesion.session_key)
+
+            def enviar(horario_id):
+                r = http.post(base + URL_RESERVA, json={"evento_id": horario_id}, timeout=60)
+                return r.status_code
+            return enviar
+        return para
+
+    def _cliente(self, trabajo):
+        enviar, objetivos = trabajo
+        resultados = []
+        try:
+            for horario_id in objetivos:
+                inicio = time.perf_counter()
+                try:
+                    estado = enviar(horario_id)
+                except Exception as e:
+                    estado = type(e).__name__
+                resultados.append((estado, time.perf_counter() - inicio))
+        finally:
+            connections.close_all()
+        return resultados
+
+    def _reporte(self, resultados, duracion, horarios):
+        estados = Counter(estado for estado, _ in resultados)
+        ms = sorted(t * 1000 for _, t in resultados)
+        total = len(resultados)
+
+        def percentil(p):
+            return ms[min(len(ms) - 1, int(len(ms) * p))]
+
+        citas = Cita.objects.filter(tarotista__usuario__username__startswith=PREFIJO)
+        reservados = Horario.objects.filter(id__in=horarios, reservado=True).count()
+        dobles = (citas.values("tarotista_id", "fecha_hora")
+                  .annotate(n=Count("id"))
+                  .filter(n__gt=1)
+                  .count())
+
+        self.stdout.write(f"Peticiones: {total} en {duracion:.2f} s ({total / duracion:.1f} req/s)")
+        self.stdout.write(
+            f"Latencia: p50 {percentil(0.50):.1f} ms, p99 {percentil(0.99):.1f} ms, "
+            f"máx {ms[-1]:.1f} ms, promedio {statistics.mean(ms):.1f} ms"
+        )
+        self.stdout.write("Respuestas: " + ", ".join(f"{k}: {v}" for k, v in sorted(estados.items(), key=str)))
+        self.stdout.write(f"Tasa de 409: {100 * estados.get(409, 0) / total:.1f} %")
+        self.stdout.write(
+            f"Horarios: {len(horarios)}, reservados: {reservados}, citas: {citas.count()}, "
+            f"respuestas 200: {estados.get(200, 0)}"
+        )
+
+        problemas = dobles or citas.count() != reservados or estados.get(200, 0) != reservados
+        if problemas:
+            self.stdout.write(self.style.ERROR(
+                f"RESERVAS DOBLES O INCONSISTENTES: {dobles} horarios con más de una cita"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Sin reservas dobles"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from core.cambios_utils import podar_cambios
+from core.espera_utils import podar_esperas, promover_vencidas
+from core.horario_utils import materializar, podar_horarios, recalcular_cargas, semanas_materializadas
+from core.idempotencia_utils import podar_claves
+
+
+class Command(BaseCommand):
+    help = (
+        "Cambio de semana del calendario: genera los Horario fechados de cada Disponibilidad "
+        "para las próximas semanas y borra los libres de semanas pasadas. Idempotente y "
+        "seguro en varios nodos a la vez (cada paso es un INSERT que omite los existentes o "
+        "un DELETE por rango); pensado para cron, al menos al empezar cada semana."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--semanas",
+            type=int,
+            default=None,
+            help="Semanas hacia adelante (por defecto settings.HORARIOS_SEMANAS)",
+        )
+
+    def handle(self, *args, **options):
+        semanas = options["semanas"] or semanas_materializadas()
+        total = materializar(semanas=semanas)
+        pasados = podar_horarios()
+        podados = podar_cambios()
+        claves = podar_claves()
+        promovidos = promover_vencidas()
+        esperas = podar_esperas()
+        recalcular_cargas()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Horarios revisados para {semanas} semanas: {total} (los existentes se omiten); "
+            f"{pasados} horarios libres de semanas pasadas, {podados} cambios antiguos, "
+            f"{claves} claves de idempotencia vencidas y {esperas} esperas pasadas eliminados; {promovidos} clientes en espera promovidos"
+        ))
@@ -0,0 +1,104 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from citas.models import Cita
+from core.horario_utils import reservar
+from core.models import Horario
+from tarotistas.models import Tarotista
+from usuarios.models import Usuario
+
+
+PREFIJO = "_medicion_reserva"
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuánto tiempo queda bloqueado un horario al reservar: el camino anterior "
+        "(select_for_update + correos dentro de la transacción) contra el UPDATE condicional. "
+        "Crea sus propios usuarios y horarios de prueba y los borra al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reservas", type=int, default=50, help="Reservas por estrategia")
+        parser.add_argument(
+            "--latencia-correo",
+            type=int,
+            default=300,
+            help="Milisegundos simulados por cada uno de los 2 correos (SendGrid)",
+        )
+
+    def handle(self, *args, **options):
+        n = options["reservas"]
+        latencia = options["latencia_correo"] / 1000
+
+        tarotista, cliente = self._crear_datos()
+        try:
+            horarios = self._crear_horarios(tarotista, 2 * n)
+
+            antes = [self._reservar_con_bloqueo(h, cliente, latencia) for h in horarios[:n]]
+            despues = [self._reservar_condicional(h, cliente, latencia) for h in horarios[n:]]
+        finally:
+            Usuario.objects.filter(username__startswith=PREFIJO).delete()
+
+        self._reporte("select_for_update (anterior)", antes)
+        self._reporte("UPDATE condicional", despues)
+
+    def _crear_datos(self):
+        Usuario.objects.filter(username__startswith=PREFIJO).delete()
+        usuario_tarotista = Usuario.objects.create(username=f"{PREFIJO}_tarotista", es_tarotista=True)
+        tarotista = Tarotista.objects.create(usuario=usuario_tarotista, descripcion="Medición")
+        cliente = Usuario.objects.create(username=f"{PREFIJO}_cliente")
+        return tarotista, cliente
+
+    def _crear_horarios(self, tarotista, cantidad):
+        # Muy en el futuro y sin regla de origen para no cruzarse con horarios reales
+        inicio = timezone.now().replace(microsecond=0) + timedelta(days=3650)
+        Horario.objects.bulk_create([
+            Horario(
+                tarotista=tarotista,
+                inicio=inicio + timedelta(minutes=30 * i),
+                fin=inicio + timedelta(minutes=30 * (i + 1)),
+            )
+            for i in range(cantidad)
+        ])
+        return list(Horario.objects.filter(tarotista=tarotista).order_by('inicio'))
+
+    def _reservar_con_bloqueo(self, horario, cliente, latencia):
+        """Estrategia anterior de reservar_horario: el lock dura hasta el commit, con correos dentro."""
+        with transaction.atomic():
+            horario = Horario.objects.select_for_update().get(id=horario.id)
+            bloqueado = time.perf_counter()
+            cita = Cita.objects.create(
+                cliente=cliente,
+                tarotista_id=horario.tarotista_id,
+                fecha_hora=horario.inicio,
+                duracion=30,
+                estado='confirmada',
+                servicio='basico',
+            )
+            horario.reservado = True
+            horario.cita = cita
+            horario.save(update_fields=['reservado', 'cita'])
+            time.sleep(2 * latencia)
+        return time.perf_counter() - bloqueado
+
+    def _reservar_condicional(self, horario, cliente, latencia):
+        """Camino actual (core.horario_utils.reservar): el lock del UPDATE dura hasta el commit."""
+        inicio = time.perf_counter()
+        reservar(horario, cliente, 'basico')
+        bloqueo = time.perf_counter() - inicio
+        time.sleep(2 * latencia)  # correos, ya sin lock
+        return bloqueo
+
+    def _reporte(self, nombre, tiempos):
+        ms = sorted(t * 1000 for t in tiempos)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        self.stdout.write(
+            f"{nombre}: lock promedio {statistics.mean(ms):.2f} ms, "
+            f"p50 {statistics.median(ms):.2f} ms, p95 {p95:.2f} ms, máx {ms[-1]:.2f} ms"
+        )
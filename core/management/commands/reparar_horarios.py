@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.horario_utils import horarios_actualizados
+from core.models import Horario
+
+
+# Reservados sin cita viva: la cita se borró (Horario.cita quedó en NULL) o se canceló
+HUERFANOS = Q(reservado=True) & (Q(cita__isnull=True) | Q(cita__estado='cancelada'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Libera los horarios futuros que quedaron reservados sin una cita vigente "
+        "(citas borradas o canceladas por fuera de cancelar_cita). Recorre por lotes "
+        "de id con una transacción corta por lote; se puede correr en cualquier momento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500, help="Horarios por transacción")
+        parser.add_argument("--simular", action="store_true", help="Solo cuenta, no modifica nada")
+
+    def handle(self, *args, **options):
+        huerfanos = Horario.objects.filter(HUERFANOS, inicio__gte=timezone.now())
+
+        if options["simular"]:
+            self.stdout.write(f"Horarios por liberar: {huerfanos.count()}")
+            return
+
+        liberados = 0
+        ultimo_id = 0
+        while True:
+            ids = list(huerfanos
+                       .filter(id__gt=ultimo_id)
+                       .order_by("id")
+                       .values_list("id", flat=True)[:options["lote"]])
+            if not ids:
+                break
+            ultimo_id = ids[-1]
+
+            with transaction.atomic():
+                # Se vuelve a filtrar con las filas bloqueadas: un horario que se
+                # reservó de nuevo entremedio ya tiene cita vigente y no se toca
+                lote = list(Horario.objects
+                            .select_for_update(of=("self",))
+                            .filter(HUERFANOS, id__in=ids))
+                Horario.objects.filter(id__in=[h.id for h in lote]).update(reservado=False, cita=None)
+                for h in lote:
+                    h.reservado = False
+                    h.cita = None
+                if lote:
+                    horarios_actualizados('liberado', lote)
+            liberados += len(lote)
+
+        self.stdout.write(self.style.SUCCESS(f"Horarios liberados: {liberados}"))
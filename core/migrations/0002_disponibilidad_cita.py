@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def enlazar_citas_existentes(apps, schema_editor):
+    """Asocia cada bloque reservado con la cita que lo ocupó.
+
+    Antes el vínculo se deducía por tarotista + día de la semana (JS) + hora;
+    aquí se hace una sola vez usando la cita más reciente que calce.
+    """
+    Disponibilidad = apps.get_model('core', 'Disponibilidad')
+    Cita = apps.get_model('citas', 'Cita')
+
+    reservados = Disponibilidad.objects.filter(reservado=True, cita__isnull=True)
+    tarotista_ids = set(reservados.values_list('tarotista_id', flat=True))
+    if not tarotista_ids:
+        return
+
+    # (tarotista_id, dia_semana JS, hora_inicio) -> id de la cita más reciente
+    citas_por_clave = {}
+    citas = (Cita.objects
+             .filter(tarotista_id__in=tarotista_ids)
+             .order_by('fecha_hora')
+             .values_list('id', 'tarotista_id', 'fecha_hora'))
+    for cita_id, tarotista_id, fecha_hora in citas:
+        if timezone.is_aware(fecha_hora):
+            fecha_hora = timezone.localtime(fecha_hora)
+        js_dia = (fecha_hora.weekday() + 1) % 7
+        citas_por_clave[(tarotista_id, js_dia, fecha_hora.time())] = cita_id
+
+    usados = set()
+    for bloque in reservados.order_by('id'):
+        cita_id = citas_por_clave.get((bloque.tarotista_id, bloque.dia_semana, bloque.hora_inicio))
+        if cita_id and cita_id not in usados:
+            usados.add(cita_id)
+            Disponibilidad.objects.filter(id=bloque.id).update(cita_id=cita_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0002_cita_servicio'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='disponibilidad',
+            name='cita',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bloques', to='citas.cita'),
+        ),
+        migrations.RunPython(enlazar_citas_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:20
+
+from datetime import datetime, timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def _local(fecha, hora):
+    return timezone.make_aware(datetime.combine(fecha, hora))
+
+
+def _fin(fecha, regla):
+    fin_fecha = fecha if regla.hora_fin > regla.hora_inicio else fecha + timedelta(days=1)
+    return _local(fin_fecha, regla.hora_fin)
+
+
+def materializar_y_migrar_reservas(apps, schema_editor):
+    """
+    Genera los Horario de las próximas HORARIOS_SEMANAS semanas y traslada las
+    reservas del modelo semanal: el bloque reservado pasa a la fecha de su cita
+    (o a la próxima ocurrencia si no tenía cita enlazada).
+    """
+    Disponibilidad = apps.get_model('core', 'Disponibilidad')
+    Horario = apps.get_model('core', 'Horario')
+
+    hoy = timezone.localdate()
+    hasta = hoy + timedelta(weeks=int(getattr(settings, 'HORARIOS_SEMANAS', 8)))
+    js_hoy = (hoy.weekday() + 1) % 7
+
+    nuevos = []
+    for regla in Disponibilidad.objects.all().iterator():
+        fecha = hoy + timedelta(days=(regla.dia_semana - js_hoy) % 7)
+        while fecha < hasta:
+            nuevos.append(Horario(
+                tarotista_id=regla.tarotista_id,
+                disponibilidad_id=regla.id,
+                inicio=_local(fecha, regla.hora_inicio),
+                fin=_fin(fecha, regla),
+            ))
+            fecha += timedelta(days=7)
+    Horario.objects.bulk_create(nuevos, ignore_conflicts=True, batch_size=1000)
+
+    for regla in Disponibilidad.objects.filter(reservado=True).select_related('cita'):
+        if regla.cita_id:
+            fecha = timezone.localtime(regla.cita.fecha_hora).date()
+        else:
+            fecha = hoy + timedelta(days=(regla.dia_semana - js_hoy) % 7)
+
+        Horario.objects.update_or_create(
+            disponibilidad_id=regla.id,
+            inicio=_local(fecha, regla.hora_inicio),
+            defaults={
+                'tarotista_id': regla.tarotista_id,
+                'fin': _fin(fecha, regla),
+                'reservado': True,
+                'cita_id': regla.cita_id,
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0002_cita_servicio'),
+        ('core', '0002_disponibilidad_cita'),
+        ('tarotistas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Horario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField()),
+                ('reservado', models.BooleanField(default=False)),
+                ('cita', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='horarios', to='citas.cita')),
+                ('disponibilidad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='horarios', to='core.disponibilidad')),
+                ('tarotista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='tarotistas.tarotista')),
+            ],
+            options={
+                'verbose_name': 'Horario',
+                'verbose_name_plural': 'Horarios',
+                'ordering': ['inicio'],
+                'indexes': [models.Index(fields=['tarotista', 'inicio'], name='core_horari_tarotis_e5e81b_idx'), models.Index(fields=['reservado', 'inicio'], name='core_horari_reserva_495617_idx')],
+                'constraints': [models.UniqueConstraint(fields=('disponibilidad', 'inicio'), name='unique_horario_disponibilidad_inicio')],
+            },
+        ),
+        migrations.RunPython(materializar_y_migrar_reservas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_horario'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='disponibilidad',
+            name='cita',
+        ),
+        migrations.RemoveField(
+            model_name='disponibilidad',
+            name='reservado',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_disponibilidad_regla_semanal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('agregado', 'Agregado'), ('eliminado', 'Eliminado'), ('reservado', 'Reservado'), ('liberado', 'Liberado')], max_length=10)),
+                ('horario_id', models.BigIntegerField()),
+                ('tarotista_id', models.BigIntegerField()),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField()),
+                ('creado', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Cambio de horario',
+                'verbose_name_plural': 'Cambios de horario',
+                'ordering': ['id'],
+            },
+        ),
+    ]
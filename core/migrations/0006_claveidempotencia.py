@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_cambiohorario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100)),
+                ('estado', models.PositiveSmallIntegerField(help_text='Código HTTP de la respuesta')),
+                ('respuesta', models.JSONField()),
+                ('creado', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claves_idempotencia', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Clave de idempotencia',
+                'verbose_name_plural': 'Claves de idempotencia',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'clave'), name='unique_clave_idempotencia_usuario')],
+            },
+        ),
+    ]
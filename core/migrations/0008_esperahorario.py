@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_horario_retencion'),
+        ('tarotistas', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EsperaHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Fecha local del día que se espera')),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('tarotista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='esperas', to='tarotistas.tarotista')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='esperas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Espera de horario',
+                'verbose_name_plural': 'Esperas de horario',
+                'ordering': ['creado', 'id'],
+                'indexes': [models.Index(fields=['tarotista', 'fecha', 'creado', 'id'], name='core_espera_tarotis_e49af7_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'tarotista', 'fecha'), name='unique_espera_usuario_dia')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:41
+
+import time
+
+from django.db import migrations, models
+
+
+def crear_version(apps, schema_editor):
+    # Parte del timestamp: una BD recreada no repite versiones (ni ETags) ya entregadas
+    VersionCalendario = apps.get_model('core', 'VersionCalendario')
+    VersionCalendario.objects.get_or_create(id=1, defaults={'valor': int(time.time() * 1000)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_esperahorario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCalendario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Versión del calendario',
+                'verbose_name_plural': 'Versión del calendario',
+            },
+        ),
+        migrations.RunPython(crear_version, migrations.RunPython.noop),
+    ]
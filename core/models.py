@@ -26,21 +26,19 @@ class Reporte(models.Model):
     def __str__(self):
         return f"Reporte de {self.tarotista.usuario.get_full_name()} sobre {self.paciente.get_full_name()}"
 
-# --- Modelo Disponibilidad (CORREGIDO: Se añade 'reservado' y tipos de campo) ---
+# --- Modelo Disponibilidad: regla semanal (día + hora) de un tarotista ---
 class Disponibilidad(models.Model):
     tarotista = models.ForeignKey(Tarotista, on_delete=models.CASCADE)
     
-    # Campo para el día de la semana (por ejemplo, 0=Lunes, 6=Domingo)
+    # Día de la semana como JS getDay() (0=Domingo, 6=Sábado)
     dia_semana = models.IntegerField(
         help_text="Número del día de la semana (0-6)"
     )
     # Es mejor usar TimeField para la hora y no TimezoneField si se normalizan
     hora_inicio = models.TimeField()
     hora_fin = models.TimeField()
-    
-    # === CAMPO AÑADIDO PARA RESOLVER EL ERROR ===
-    reservado = models.BooleanField(default=False)
-    # ===========================================
+
+    # Las reservas viven en Horario (una fila por fecha concreta), no aquí
     
     class Meta:
         verbose_name = 'Disponibilidad'
@@ -52,3 +50,161 @@ class Disponibilidad(models.Model):
 
     def __str__(self):
         return f"Disponibilidad de {self.tarotista} para el día {self.dia_semana}"
+
+
+# --- Modelo Horario: bloque con fecha concreta generado desde Disponibilidad ---
+class Horario(models.Model):
+    """
+    Ocurrencia fechada (y con zona horaria) de una Disponibilidad semanal.
+    Se materializan HORARIOS_SEMANAS semanas hacia adelante (ver core/horario_utils.py);
+    el feed y las reservas consultan esta tabla por rango de fechas.
+    """
+    tarotista = models.ForeignKey(Tarotista, on_delete=models.CASCADE, related_name='horarios')
+    # Regla de origen; si se elimina, las horas ya reservadas se conservan
+    disponibilidad = models.ForeignKey(
+        Disponibilidad,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='horarios'
+    )
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField()
+    reservado = models.BooleanField(default=False)
+
+    # Cita creada al reservar este horario (la usa el feed para saber a quién
+    # mostrarle el bloque ocupado sin buscar la cita por fecha/hora).
+    cita = models.ForeignKey(
+        Cita,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='horarios'
+    )
+
+    # Retención temporal mientras alguien elige el servicio (ver core/retencion_utils.py).
+    # Vencida, el horario vuelve a estar libre sin que nada la borre.
+    retenido_por = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='horarios_retenidos'
+    )
+    retenido_hasta = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['inicio']
+        verbose_name = 'Horario'
+        verbose_name_plural = 'Horarios'
+        indexes = [
+            models.Index(fields=['tarotista', 'inicio']),
+            models.Index(fields=['reservado', 'inicio']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['disponibilidad', 'inicio'], name='unique_horario_disponibilidad_inicio')
+        ]
+
+    def __str__(self):
+        return f"Horario de {self.tarotista} el {self.inicio}"
+
+
+# --- Registro de cambios para la sincronización incremental ---
+class CambioHorario(models.Model):
+    """
+    Un cambio de estado de un Horario (lo escriben las señales y materializar).
+    El id es el número de secuencia: el cliente guarda el último que vio y pide
+    solo los posteriores (ver core/cambios_utils.py). Guarda copias de los datos
+    del horario porque este puede ya no existir.
+    """
+    TIPOS = [
+        ('agregado', 'Agregado'),
+        ('eliminado', 'Eliminado'),
+        ('reservado', 'Reservado'),
+        ('liberado', 'Liberado'),
+    ]
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    horario_id = models.BigIntegerField()
+    tarotista_id = models.BigIntegerField()
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField()
+    creado = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Cambio de horario'
+        verbose_name_plural = 'Cambios de horario'
+
+    def __str__(self):
+        return f"#{self.id} {self.tipo} horario {self.horario_id}"
+
+
+# --- Respuestas guardadas por clave de idempotencia (reintentos de reservas) ---
+class ClaveIdempotencia(models.Model):
+    """
+    Respuesta de reservar_horario para una clave Idempotency-Key del usuario.
+    Un reintento con la misma clave recibe esta respuesta sin volver a reservar.
+    Vencen a las IDEMPOTENCIA_HORAS (ver core/idempotencia_utils.py).
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='claves_idempotencia')
+    clave = models.CharField(max_length=100)
+    estado = models.PositiveSmallIntegerField(help_text="Código HTTP de la respuesta")
+    respuesta = models.JSONField()
+    creado = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Clave de idempotencia'
+        verbose_name_plural = 'Claves de idempotencia'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'clave'], name='unique_clave_idempotencia_usuario')
+        ]
+
+    def __str__(self):
+        return f"{self.clave} ({self.usuario}) -> {self.estado}"
+
+
+# --- Lista de espera por tarotista y día (se promueve al liberarse un horario) ---
+class EsperaHorario(models.Model):
+    """
+    Cliente esperando que se libere una hora de la tarotista en esa fecha.
+    Al liberarse un horario se toma el primero de la fila con el índice
+    (tarotista, fecha, creado), sin recorrer la lista, y se le retiene el
+    horario unos minutos (ver core/espera_utils.py).
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='esperas')
+    tarotista = models.ForeignKey(Tarotista, on_delete=models.CASCADE, related_name='esperas')
+    fecha = models.DateField(help_text="Fecha local del día que se espera")
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['creado', 'id']
+        verbose_name = 'Espera de horario'
+        verbose_name_plural = 'Esperas de horario'
+        indexes = [
+            models.Index(fields=['tarotista', 'fecha', 'creado', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'tarotista', 'fecha'], name='unique_espera_usuario_dia')
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} espera a {self.tarotista} el {self.fecha}"
+
+
+# --- Versión del calendario compartida por todos los procesos ---
+class VersionCalendario(models.Model):
+    """
+    Fila única con la versión de los datos del calendario. Va en la BD y no en
+    la caché porque esta es por proceso (LocMem): los cambios que hacen el cron
+    y el worker también tienen que invalidar el feed de los procesos web
+    (ver core/cache_utils.py).
+    """
+    valor = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Versión del calendario'
+        verbose_name_plural = 'Versión del calendario'
+
+    def __str__(self):
+        return f"Versión {self.valor}"
@@ -0,0 +1,93 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .cache_utils import invalidar_disponibilidad, snapshot_key, SNAPSHOT_TIMEOUT
+from .espera_utils import promover_vencidas
+from .horario_utils import horarios_actualizados, sin_retencion_ajena
+from .models import Horario
+from .stream_utils import publicar
+
+
+def minutos_retencion() -> int:
+    return int(getattr(settings, "RETENCION_MINUTOS", 5))
+
+
+def retenciones_activas(version=None):
+    """
+    {horario_id: usuario_id} de las retenciones vigentes. Se cachea por versión
+    del calendario y solo hasta que vence la primera: así las vencidas se
+    liberan al leer, sin un proceso que las limpie. Si al recalcular hay
+    vencidas, antes se pasan al siguiente en la lista de espera: el horario
+    no alcanza a aparecer libre para todos mientras alguien lo espera.
+    """
+    key = snapshot_key('retenciones', version=version)
+    activas = cache.get(key)
+
+    if activas is None:
+        ahora = timezone.now()
+        # Por el índice de retenido_hasta; tras limpiarlas deja de encontrar filas
+        if Horario.objects.filter(retenido_hasta__lte=ahora).exists():
+            promover_vencidas()
+            key = snapshot_key('retenciones')
+        filas = list(Horario.objects
+                     .filter(retenido_hasta__gt=ahora, reservado=False)
+                     .values_list('id', 'retenido_por_id', 'retenido_hasta'))
+        activas = {horario_id: usuario_id for horario_id, usuario_id, _ in filas}
+
+        timeout = SNAPSHOT_TIMEOUT
+        if filas:
+            primera = min(hasta for _, _, hasta in filas)
+            timeout = min(timeout, max(1, math.ceil((primera - ahora).total_seconds())))
+        cache.set(key, activas, timeout)
+
+    return activas
+
+
+def horarios_ocultos(usuario, version=None):
+    """Ids de horarios retenidos por otras personas (no se le muestran al usuario)."""
+    usuario_id = usuario.pk if usuario.is_authenticated else None
+    return {h for h, u in retenciones_activas(version).items() if u != usuario_id}
+
+
+def retener(horario_id, usuario):
+    """
+    Retiene el horario para el usuario por RETENCION_MINUTOS con un UPDATE
+    condicional (libre, futuro y sin retención vigente de otra persona).
+    Cada persona tiene una sola retención: la anterior se suelta.
+    Retorna el vencimiento, o None si el horario no se pudo retener.
+    """
+    ahora = timezone.now()
+    hasta = ahora + timedelta(minutes=minutos_retencion())
+
+    with transaction.atomic():
+        tomados = (Horario.objects
+                   .filter(sin_retencion_ajena(usuario, ahora),
+                           id=horario_id, reservado=False, inicio__gte=ahora)
+                   .update(retenido_por=usuario, retenido_hasta=hasta))
+        if not tomados:
+            return None
+
+        soltar(usuario, excepto=horario_id)
+        publicar('retenido', id=int(horario_id), hasta=timezone.localtime(hasta).isoformat())
+        invalidar_disponibilidad()
+
+    return hasta
+
+
+def soltar(usuario, horario_id=None, excepto=None):
+    """Suelta las retenciones del usuario (o solo la de horario_id) y avisa que quedaron libres."""
+    retenidos = Horario.objects.filter(retenido_por=usuario)
+    if horario_id is not None:
+        retenidos = retenidos.filter(id=horario_id)
+    if excepto is not None:
+        retenidos = retenidos.exclude(id=excepto)
+
+    vigentes = list(retenidos.filter(retenido_hasta__gt=timezone.now(), reservado=False))
+    retenidos.update(retenido_por=None, retenido_hasta=None)
+    if vigentes:
+        horarios_actualizados('liberado', vigentes)
@@ -0,0 +1,81 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from citas.models import Cita
+from .cache_utils import invalidar_disponibilidad
+from .cambios_utils import registrar_cambios
+from .espera_utils import promover_esperas
+from .horario_utils import datos_horario, liberar_horarios, materializar
+from .models import Disponibilidad, Horario
+from .stream_utils import publicar
+
+
+@receiver(post_save, sender=Disponibilidad)
+@receiver(post_delete, sender=Disponibilidad)
+@receiver(post_save, sender=Horario)
+@receiver(post_delete, sender=Horario)
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+def calendario_modificado(sender, instance, **kwargs):
+    # Cualquier escritura (vistas, admin, shell) invalida el feed cacheado
+    invalidar_disponibilidad()
+
+
+@receiver(post_save, sender=Disponibilidad)
+def materializar_regla(sender, instance, created, **kwargs):
+    if created:
+        materializar([instance])
+
+
+@receiver(pre_delete, sender=Disponibilidad)
+def eliminar_horarios_libres(sender, instance, **kwargs):
+    # Las horas ya reservadas se conservan (Horario.disponibilidad queda en NULL)
+    Horario.objects.filter(disponibilidad=instance, reservado=False).delete()
+
+
+def _tipo_guardado(horario, created):
+    if created:
+        return 'agregado'
+    return 'reservado' if horario.reservado else 'liberado'
+
+
+@receiver(post_save, sender=Horario)
+def publicar_horario_guardado(sender, instance, created, **kwargs):
+    publicar(_tipo_guardado(instance, created), **datos_horario(instance))
+
+
+@receiver(post_delete, sender=Horario)
+def publicar_horario_eliminado(sender, instance, **kwargs):
+    publicar('eliminado', **datos_horario(instance))
+
+
+@receiver(post_save, sender=Horario)
+def registrar_horario_guardado(sender, instance, created, **kwargs):
+    # Misma transacción que el cambio: el registro nunca adelanta a los datos
+    registrar_cambios(_tipo_guardado(instance, created), [instance])
+
+
+@receiver(post_delete, sender=Horario)
+def registrar_horario_eliminado(sender, instance, **kwargs):
+    registrar_cambios('eliminado', [instance])
+
+
+@receiver(post_save, sender=Horario)
+def promover_espera_horario(sender, instance, created, **kwargs):
+    # Un horario liberado (cancelación, admin) pasa al primero en la lista de espera
+    if _tipo_guardado(instance, created) == 'liberado':
+        promover_esperas([instance])
+
+
+@receiver(post_save, sender=Cita)
+def liberar_cita_cancelada(sender, instance, created, **kwargs):
+    # Una cita cancelada desde el admin (u otro lugar) devuelve sus horarios
+    if instance.estado == 'cancelada':
+        liberar_horarios(instance)
+
+
+@receiver(pre_delete, sender=Cita)
+def liberar_cita_eliminada(sender, instance, **kwargs):
+    # Una cita borrada desde el admin o en cascada (p.ej. al borrar el usuario):
+    # Horario.cita pasaría a NULL con reservado = true y la hora quedaría tomada
+    liberar_horarios(instance)
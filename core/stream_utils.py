@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+from django.db import transaction
+
+
+# Mensajes pendientes por cliente; si se llena, se le pide recargar ("resync")
+MAX_PENDIENTES = 100
+
+_suscriptores = set()
+_lock = threading.Lock()
+
+
+def stream_disponible(request) -> bool:
+    """
+    True si la petición llegó por ASGI: solo ahí horarios_stream puede mantener
+    la conexión abierta. Bajo WSGI (gunicorn del Procfile) los calendarios se
+    ponen al día con horarios_cambios, que lee el registro de la BD y por eso
+    también ve lo que escriben otros procesos (cron, worker).
+    """
+    return 'wsgi.version' not in request.META
+
+
+def suscribir():
+    """Registra un cliente SSE en el loop actual (solo bajo ASGI)."""
+    suscripcion = (asyncio.get_running_loop(), asyncio.Queue(maxsize=MAX_PENDIENTES))
+    with _lock:
+        _suscriptores.add(suscripcion)
+    return suscripcion
+
+
+def desuscribir(suscripcion):
+    with _lock:
+        _suscriptores.discard(suscripcion)
+
+
+def _entregar(cola, mensaje):
+    try:
+        cola.put_nowait(mensaje)
+    except asyncio.QueueFull:
+        # Cliente lento: se descarta lo pendiente y se le pide recargar el calendario
+        while not cola.empty():
+            cola.get_nowait()
+        cola.put_nowait({'tipo': 'resync'})
+
+
+def publicar(tipo, **datos):
+    """
+    Envía un cambio de horario a los calendarios abiertos de este proceso
+    cuando se confirma la transacción actual.
+    Tipos: agregado, eliminado, reservado, liberado.
+    """
+    mensaje = {'tipo': tipo, **datos}
+
+    def _enviar():
+        with _lock:
+            suscriptores = list(_suscriptores)
+        for suscripcion in suscriptores:
+            loop, cola = suscripcion
+            try:
+                loop.call_soon_threadsafe(_entregar, cola, mensaje)
+            except RuntimeError:
+                # El loop del cliente ya se cerró
+                desuscribir(suscripcion)
+
+    transaction.on_commit(_enviar)
@@ -0,0 +1,285 @@
+import json
+from datetime import time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from citas.models import Cita
+from core import idempotencia_utils
+from core.horario_utils import cancelar_cita, materializar, podar_horarios, reservar
+from core.models import CambioHorario, Disponibilidad, EsperaHorario, Horario
+from tarotistas.models import Tarotista
+from usuarios.models import CorreoPendiente, Usuario
+
+
+URL_RESERVA = "/calendario/reservar/"
+
+
+class CalendarioTestMixin:
+    """Una tarotista con un horario libre mañana y dos clientes."""
+
+    def setUp(self):
+        # TestCase no confirma: la versión del calendario no sube entre pruebas
+        # y los snapshots de LocMem de una prueba anterior seguirían vigentes
+        cache.clear()
+        usuario = Usuario.objects.create_user('tarotista', 'tarotista@example.com', 'x', es_tarotista=True)
+        self.tarotista = Tarotista.objects.create(usuario=usuario, descripcion='Prueba')
+        self.ana = Usuario.objects.create_user('ana', 'ana@example.com', 'x')
+        self.bea = Usuario.objects.create_user('bea', 'bea@example.com', 'x')
+        self.horario = self.crear_horario(timezone.now() + timedelta(days=1))
+
+    def crear_horario(self, inicio, minutos=30):
+        inicio = inicio.replace(second=0, microsecond=0)
+        return Horario.objects.create(
+            tarotista=self.tarotista, inicio=inicio, fin=inicio + timedelta(minutes=minutos)
+        )
+
+    def reservar_como(self, usuario, horario=None, clave=None, **datos):
+        self.client.force_login(usuario)
+        datos.setdefault('evento_id', (horario or self.horario).id)
+        headers = {'Idempotency-Key': clave} if clave else None
+        return self.client.post(URL_RESERVA, json.dumps(datos), content_type='application/json',
+                                secure=True, headers=headers)
+
+
+class ReservaCondicionalTests(CalendarioTestMixin, TestCase):
+
+    def test_dos_reservas_del_mismo_horario(self):
+        primera = self.reservar_como(self.ana)
+        segunda = self.reservar_como(self.bea)
+
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(segunda.status_code, 409)
+        self.assertEqual(Cita.objects.count(), 1)
+        self.horario.refresh_from_db()
+        self.assertTrue(self.horario.reservado)
+        self.assertEqual(self.horario.cita.cliente, self.ana)
+
+    def test_la_segunda_lectura_vieja_no_reserva(self):
+        # Las dos peticiones leyeron el horario libre antes de que alguna reservara:
+        # solo el primer UPDATE condicional encuentra la fila con reservado = false
+        leido_por_ana = Horario.objects.get(id=self.horario.id)
+        leido_por_bea = Horario.objects.get(id=self.horario.id)
+
+        self.assertIsNotNone(reservar(leido_por_ana, self.ana, 'basico'))
+        self.assertIsNone(reservar(leido_por_bea, self.bea, 'basico'))
+        self.assertEqual(Cita.objects.filter(tarotista=self.tarotista).count(), 1)
+
+
+class FeedTests(CalendarioTestMixin, TestCase):
+
+    def pedir_feed(self, **headers):
+        self.client.force_login(self.ana)
+        return self.client.get("/calendario/horarios/", secure=True, headers=headers)
+
+    def test_lee_la_version_una_vez_por_peticion(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.pedir_feed()
+        lecturas = [q for q in consultas.captured_queries if 'versioncalendario' in q['sql']]
+        self.assertEqual(len(lecturas), 1)
+
+    def test_refetch_sin_cambios_recibe_304(self):
+        etag = self.pedir_feed()['ETag']
+        self.assertEqual(self.pedir_feed(if_none_match=etag).status_code, 304)
+
+        # La versión sube al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_horario(self.horario.inicio + timedelta(hours=1))
+        self.assertEqual(self.pedir_feed(if_none_match=etag).status_code, 200)
+
+
+class IdempotenciaTests(CalendarioTestMixin, TestCase):
+
+    def test_reintento_recibe_la_respuesta_guardada(self):
+        primera = self.reservar_como(self.ana, clave='k1')
+        segunda = self.reservar_como(self.ana, clave='k1')
+
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda.json(), primera.json())
+        self.assertEqual(Cita.objects.count(), 1)
+
+    def test_reintento_cruzado_con_la_original(self):
+        primera = self.reservar_como(self.ana, clave='k1')
+        # El reintento buscó la clave antes de que la original confirmara y luego
+        # perdió contra ella: recibe la respuesta de la original, no un 409
+        guardada = idempotencia_utils.respuesta_guardada
+        with mock.patch('core.views.respuesta_guardada', side_effect=[None, guardada(self.ana, 'k1')]):
+            segunda = self.reservar_como(self.ana, clave='k1')
+
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda.json(), primera.json())
+        self.assertEqual(Cita.objects.count(), 1)
+
+    def test_un_409_no_queda_guardado(self):
+        self.reservar_como(self.ana)
+        self.assertEqual(self.reservar_como(self.bea, clave='k2').status_code, 409)
+
+        Cita.objects.get().delete()
+        Horario.objects.filter(id=self.horario.id).update(reservado=False, cita=None)
+        self.assertEqual(self.reservar_como(self.bea, clave='k2').status_code, 200)
+
+
+class CanastaTests(CalendarioTestMixin, TestCase):
+
+    def reservar_canasta(self, datos):
+        self.client.force_login(self.ana)
+        return self.client.post("/calendario/reservar/varios/", json.dumps(datos),
+                                content_type='application/json', secure=True)
+
+    def test_reserva_todas_las_sesiones(self):
+        otro = self.crear_horario(self.horario.inicio + timedelta(days=7))
+        respuesta = self.reservar_canasta({'evento_ids': [self.horario.id, otro.id], 'servicio': 'amor'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(list(Cita.objects.values_list('servicio', flat=True)), ['amor', 'amor'])
+
+    def test_cuerpo_invalido(self):
+        self.assertEqual(self.reservar_canasta([1, 2]).status_code, 400)
+        self.assertEqual(self.reservar_canasta({'evento_ids': [self.horario.id], 'servicio': 'runas'}).status_code, 400)
+        self.assertFalse(Cita.objects.exists())
+
+
+class RetencionTests(CalendarioTestMixin, TestCase):
+
+    def retener_como(self, usuario):
+        self.client.force_login(usuario)
+        return self.client.post(
+            "/calendario/retener/", json.dumps({'evento_id': self.horario.id}),
+            content_type='application/json', secure=True,
+        )
+
+    def test_horario_retenido_se_rechaza_a_otros(self):
+        self.assertEqual(self.retener_como(self.ana).status_code, 200)
+
+        self.assertEqual(self.retener_como(self.bea).status_code, 409)
+        self.assertEqual(self.reservar_como(self.bea).status_code, 409)
+        # Quien lo retiene sí lo puede reservar
+        self.assertEqual(self.reservar_como(self.ana).status_code, 200)
+
+    def test_id_invalido(self):
+        self.client.force_login(self.ana)
+        for datos in ({'evento_id': 'abc'}, {'evento_id': 'abc', 'soltar': True}, {}):
+            respuesta = self.client.post("/calendario/retener/", json.dumps(datos),
+                                         content_type='application/json', secure=True)
+            self.assertEqual(respuesta.status_code, 400)
+
+    def test_retencion_vencida_libera_el_horario(self):
+        self.assertEqual(self.retener_como(self.ana).status_code, 200)
+        Horario.objects.filter(id=self.horario.id).update(retenido_hasta=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.reservar_como(self.bea).status_code, 200)
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.cita.cliente, self.bea)
+
+
+class ListaEsperaTests(CalendarioTestMixin, TestCase):
+
+    def esperar_como(self, usuario):
+        self.client.force_login(usuario)
+        return self.client.post(
+            "/calendario/espera/",
+            json.dumps({'tarotista_id': self.tarotista.id,
+                        'fecha': timezone.localdate(self.horario.inicio).isoformat()}),
+            content_type='application/json', secure=True,
+        )
+
+    def test_cancelar_cita_promueve_al_primero_en_espera(self):
+        cita = reservar(self.horario, self.ana, 'basico')
+        carla = Usuario.objects.create_user('carla', 'carla@example.com', 'x')
+        self.assertEqual(self.esperar_como(self.bea).json()['posicion'], 1)
+        self.assertEqual(self.esperar_como(carla).json()['posicion'], 2)
+
+        cancelar_cita(cita)
+
+        self.horario.refresh_from_db()
+        self.assertFalse(self.horario.reservado)
+        self.assertEqual(self.horario.retenido_por, self.bea)
+        self.assertGreater(self.horario.retenido_hasta, timezone.now())
+        # Bea sale de la fila y recibe el aviso; Carla queda primera
+        self.assertEqual(list(EsperaHorario.objects.values_list('usuario__username', flat=True)), ['carla'])
+        self.assertTrue(CorreoPendiente.objects.filter(destinatarios=['bea@example.com']).exists())
+
+        # Para los demás el horario sigue tomado mientras dura la retención
+        self.assertEqual(self.reservar_como(carla).status_code, 409)
+        self.assertEqual(self.reservar_como(self.bea).status_code, 200)
+
+    def test_retencion_vencida_pasa_al_siguiente_al_leer_el_feed(self):
+        cita = reservar(self.horario, self.ana, 'basico')
+        carla = Usuario.objects.create_user('carla', 'carla@example.com', 'x')
+        self.esperar_como(self.bea)
+        self.esperar_como(carla)
+        cancelar_cita(cita)
+        # Bea no confirmó a tiempo
+        Horario.objects.filter(id=self.horario.id).update(retenido_hasta=timezone.now() - timedelta(seconds=1))
+
+        self.client.force_login(self.ana)
+        respuesta = self.client.get("/calendario/horarios/", secure=True)
+        eventos = json.loads(b"".join(respuesta.streaming_content))
+
+        self.assertNotIn(self.horario.id, [e['id'] for e in eventos])
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.retenido_por, carla)
+        self.assertFalse(EsperaHorario.objects.exists())
+        self.assertTrue(CorreoPendiente.objects.filter(destinatarios=['carla@example.com']).exists())
+
+
+class CitaEliminadaTests(CalendarioTestMixin, TestCase):
+
+    def assertHorarioLibre(self):
+        self.horario.refresh_from_db()
+        self.assertFalse(self.horario.reservado)
+        self.assertIsNone(self.horario.cita_id)
+        self.tarotista.refresh_from_db()
+        self.assertEqual(self.tarotista.carga, 0)
+
+    def test_borrar_la_cita_libera_su_horario(self):
+        # Como lo hace el admin: delete() sin pasar por cancelar_cita
+        reservar(self.horario, self.ana, 'basico').delete()
+        self.assertHorarioLibre()
+
+    def test_borrar_al_cliente_libera_sus_horarios(self):
+        reservar(self.horario, self.ana, 'basico')
+        self.ana.delete()
+        self.assertFalse(Cita.objects.exists())
+        self.assertHorarioLibre()
+
+
+class CalendarioSemanalTests(CalendarioTestMixin, TestCase):
+
+    def test_materializar_de_nuevo_no_inserta_ni_registra(self):
+        # Al crearse la regla se materializan sus semanas (señal post_save)
+        regla = Disponibilidad.objects.create(
+            tarotista=self.tarotista, dia_semana=3, hora_inicio=time(10), hora_fin=time(10, 30)
+        )
+        creados = Horario.objects.filter(disponibilidad=regla)
+        agregados = CambioHorario.objects.filter(tipo='agregado', horario_id__in=creados.values('id'))
+        self.assertGreater(creados.count(), 0)
+        self.assertEqual(agregados.count(), creados.count())
+
+        antes = (creados.count(), CambioHorario.objects.filter(tipo='agregado').count())
+        self.assertEqual(materializar([regla]), antes[0])
+        self.assertEqual((creados.count(), CambioHorario.objects.filter(tipo='agregado').count()), antes)
+
+    def test_podar_solo_borra_los_libres_que_ya_terminaron(self):
+        corte = timezone.now() - timedelta(days=1)
+        pasado_libre = self.crear_horario(corte - timedelta(hours=2))
+        pasado_reservado = self.crear_horario(corte - timedelta(hours=3))
+        Horario.objects.filter(id=pasado_reservado.id).update(reservado=True)
+        # Empieza antes del corte pero termina después: se conserva
+        cruza_el_corte = self.crear_horario(corte - timedelta(minutes=10), minutos=60)
+
+        self.assertEqual(podar_horarios(antes=corte), 1)
+        self.assertEqual(
+            set(Horario.objects.values_list('id', flat=True)),
+            {pasado_reservado.id, cruza_el_corte.id, self.horario.id},
+        )
+        self.assertFalse(Horario.objects.filter(id=pasado_libre.id).exists())
+
+        self.assertEqual(podar_horarios(antes=corte), 0)
@@ -19,8 +19,18 @@ urlpatterns = [
 
     # Nueva ruta para horarios disponibles
     path('calendario/horarios/', views.horarios_disponibles_json, name='horarios_disponibles_json'),
+    # Solo los cambios desde un cursor (sincronización incremental)
+    path('calendario/horarios/cambios/', views.horarios_cambios, name='horarios_cambios'),
+    # Cambios de horarios en vivo (Server-Sent Events, requiere ASGI)
+    path('calendario/horarios/stream/', views.horarios_stream, name='horarios_stream'),
+    # Retención temporal de un horario mientras se confirma
+    path('calendario/retener/', views.retener_horario, name='retener_horario'),
+    # Lista de espera de una tarotista para un día
+    path('calendario/espera/', views.esperar_horario, name='esperar_horario'),
     # Endpoint para reservar horario
     path('calendario/reservar/', views.reservar_horario, name='reservar_horario'),
+    # Varias sesiones en una sola reserva (todas o ninguna)
+    path('calendario/reservar/varios/', views.reservar_canasta, name='reservar_canasta'),
 
 
     # URLs de reportes
@@ -1,21 +1,37 @@
+from bisect import bisect_left
 from datetime import datetime, timedelta
+from itertools import chain
+import asyncio
 import json
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST, require_GET
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST, require_GET, condition
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q
-from django.db import transaction
-from django.conf import settings
-from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
+from django.core.cache import cache
 from django.utils import timezone as dj_timezone
-
-from .models import Reporte, Disponibilidad
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .cache_utils import invalidar_disponibilidad, snapshot_key, etag_disponibilidad, version_de, SNAPSHOT_TIMEOUT
+from .cambios_utils import cambios_desde, cursor_actual
+from .espera_utils import posicion
+from .horario_utils import (
+    contar_horarios, inicio_dia, materializar, minutos_servicio, reservar, reservar_menos_cargada,
+    reservar_varios, sin_retencion_ajena,
+)
+from .idempotencia_utils import MAX_LARGO_CLAVE, es_definitiva, guardar_respuesta, respuesta_guardada
+from .json_utils import arreglo_json, objeto_json, respuesta_json_stream
+from .models import Reporte, Disponibilidad, EsperaHorario, Horario
+from .retencion_utils import horarios_ocultos, retener, soltar
+from .stream_utils import stream_disponible, suscribir, desuscribir
 from citas.models import Cita
+from usuarios.correo_utils import correo, encolar
 from usuarios.models import Usuario
 from tarotistas.models import Tarotista
 
@@ -25,6 +41,12 @@ from tarotistas.models import Tarotista
 @require_POST
 @login_required
 def reservar_horario(request):
+    """Reserva un Horario y crea la Cita.
+
+    Acepta el header Idempotency-Key (o 'idempotency_key' en el cuerpo): la
+    respuesta queda guardada y un reintento con la misma clave la recibe de
+    nuevo (header Idempotent-Replayed) sin volver a reservar ni enviar correos.
+    """
     # Restringir a tarotistas
     if hasattr(request.user, 'es_tarotista') and request.user.es_tarotista:
         return JsonResponse(
@@ -32,90 +54,401 @@ def reservar_horario(request):
             status=403
         )
 
+    clave = request.headers.get('Idempotency-Key')
+    if clave:
+        repetida = respuesta_guardada(request.user, clave)
+        if repetida is not None:
+            return repetida
+
+    def responder(payload, status=200):
+        # Un 409 no se guarda: al reintentar con la misma clave se vuelve a intentar reservar
+        if clave and es_definitiva(status):
+            try:
+                with transaction.atomic():
+                    guardar_respuesta(request.user, clave, status, payload)
+            except IntegrityError:
+                # Otra petición con la misma clave terminó primero
+                return respuesta_guardada(request.user, clave)
+        elif clave:
+            # Un reintento que se cruzó con la petición original pierde el UPDATE
+            # condicional contra ella: si la original ya confirmó, se responde lo suyo
+            repetida = respuesta_guardada(request.user, clave)
+            if repetida is not None:
+                return repetida
+        return JsonResponse(payload, status=status)
+
     try:
         data = json.loads(request.body)
         evento_id = data.get('evento_id')
         servicio = data.get('servicio', 'basico')
 
-        if not evento_id:
-            return JsonResponse({'success': False, 'error': 'ID de evento requerido.'}, status=400)
-
-        # ⚠️ IMPORTANTE:
-        # select_for_update() DEBE ejecutarse dentro de una transacción (PostgreSQL/Railway).
-        with transaction.atomic():
-            # Buscar el bloque de disponibilidad con lock
-            bloque = Disponibilidad.objects.select_for_update().get(id=evento_id)
+        if not clave and data.get('idempotency_key'):
+            clave = str(data['idempotency_key'])
+            repetida = respuesta_guardada(request.user, clave)
+            if repetida is not None:
+                return repetida
 
-            if bloque.reservado:
-                return JsonResponse({'success': False, 'error': 'El horario ya está reservado.'}, status=409)
+        if clave and len(clave) > MAX_LARGO_CLAVE:
+            return JsonResponse({'success': False, 'error': 'Idempotency-Key demasiado larga.'}, status=400)
 
-            # Marcar como reservado
-            bloque.reservado = True
-            bloque.save()
+        if not evento_id:
+            if data.get('inicio'):
+                return _reservar_cualquier_tarotista(request, data, servicio, clave, responder)
+            return responder({'success': False, 'error': 'ID de evento requerido.'}, status=400)
 
-            tarotista = bloque.tarotista
+        # Buscar el horario (bloque con fecha concreta), sin lock
+        horario = Horario.objects.select_related('tarotista__usuario').get(id=evento_id)
 
-            # Calcular fecha y hora exacta
-            today = timezone.now().date()
-            js_today = (today.weekday() + 1) % 7
-            dias_hasta = (bloque.dia_semana - js_today) % 7
-            fecha = today + timedelta(days=dias_hasta)
+        if horario.reservado:
+            return responder({'success': False, 'error': 'El horario ya está reservado.'}, status=409)
 
-            fecha_hora = datetime.combine(fecha, bloque.hora_inicio)
+        if horario.inicio < timezone.now():
+            return responder({'success': False, 'error': 'El horario ya pasó.'}, status=400)
 
-            cita = Cita.objects.create(
-                cliente=request.user,
-                tarotista=tarotista,
-                fecha_hora=fecha_hora,
-                duracion=(datetime.combine(fecha, bloque.hora_fin) - fecha_hora).seconds // 60,
-                estado='confirmada',
-                servicio=servicio
-            )
+        if (horario.retenido_hasta and horario.retenido_hasta > timezone.now()
+                and horario.retenido_por_id != request.user.id):
+            return responder({'success': False, 'error': 'Otra persona está reservando este horario.'}, status=409)
 
-            # Enviar correos de confirmación (esto usa tu EMAIL_BACKEND global SendGrid)
-            tarotista_nombre = tarotista.usuario.get_full_name() if hasattr(tarotista, 'usuario') else str(tarotista)
-
-            fecha_hora_aware = cita.fecha_hora
-            if dj_timezone.is_naive(fecha_hora_aware):
-                fecha_hora_aware = dj_timezone.make_aware(fecha_hora_aware, dj_timezone.get_current_timezone())
-
-            fecha_str = fecha_hora_aware.strftime('%d/%m/%Y %H:%M')
-            servicio_display = dict(Cita.SERVICIOS).get(servicio, servicio)
-            subject = 'Confirmación de reserva de cita'
-
-            # Correo para el usuario (solo si tiene email)
-            if getattr(request.user, "email", None):
-                message_usuario = (
-                    f"Hola {request.user.get_full_name() or request.user.username},\n\n"
-                    f"Tu cita ha sido reservada con éxito.\n\n"
-                    f"Tarotista: {tarotista_nombre}\n"
-                    f"Fecha y hora: {fecha_str}\n"
-                    f"Tipo de servicio: {servicio_display}\n\n"
-                    f"Gracias por confiar en Brujitas."
-                )
-                send_mail(subject, message_usuario, settings.DEFAULT_FROM_EMAIL, [request.user.email])
-
-            # Correo para el tarotista (solo si tiene email)
-            if hasattr(tarotista, 'usuario') and getattr(tarotista.usuario, "email", None):
-                message_tarotista = (
-                    f"Hola {tarotista_nombre},\n\n"
-                    f"Tienes una nueva cita agendada.\n\n"
-                    f"Cliente: {request.user.get_full_name() or request.user.username}\n"
-                    f"Fecha y hora: {fecha_str}\n"
-                    f"Tipo de servicio: {servicio_display}\n\n"
-                    f"Por favor revisa tu panel para más detalles."
+        # ⚠️ IMPORTANTE:
+        # El horario se reclama con un UPDATE condicional (reservado = false) en una
+        # transacción de milisegundos; si otra persona ganó, no se actualiza ninguna fila.
+        # La clave se guarda en la misma transacción: existe solo si la reserva quedó hecha.
+        try:
+            cita = _reservar_y_avisar(request.user, clave, lambda: reservar(horario, request.user, servicio))
+        except IntegrityError:
+            repetida = respuesta_guardada(request.user, clave) if clave else None
+            if repetida is None:
+                raise
+            return repetida
+
+        if cita is None:
+            minutos = minutos_servicio(servicio)
+            if horario.fin - horario.inicio < timedelta(minutes=minutos):
+                return responder(
+                    {'success': False, 'error': f'No quedan {minutos} minutos seguidos libres desde esa hora.'},
+                    status=409
                 )
-                send_mail(subject, message_tarotista, settings.DEFAULT_FROM_EMAIL, [tarotista.usuario.email])
+            return responder({'success': False, 'error': 'El horario ya está reservado.'}, status=409)
 
-        return JsonResponse({'success': True, 'cita_id': cita.id})
+        return JsonResponse(_respuesta_reserva(cita))
 
-    except Disponibilidad.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Horario no encontrado.'}, status=404)
+    except Horario.DoesNotExist:
+        return responder({'success': False, 'error': 'Horario no encontrado.'}, status=404)
 
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+def _reservar_y_avisar(cliente, clave, reservar_fn, correos_fn=None, respuesta_fn=None):
+    """
+    Ejecuta la reserva y, si resultó, encola los correos y guarda la respuesta
+    de la clave de idempotencia en la misma transacción. Retorna lo que
+    retorne reservar_fn (la Cita por defecto), o None.
+    """
+    correos_fn = correos_fn or (lambda cita: _correos_reserva(cliente, cita.tarotista, cita))
+    respuesta_fn = respuesta_fn or _respuesta_reserva
+    with transaction.atomic():
+        resultado = reservar_fn()
+        if resultado is not None:
+            # Los correos quedan en el outbox con la reserva (los envía manage.py enviar_correos)
+            encolar(*correos_fn(resultado))
+            if clave:
+                guardar_respuesta(cliente, clave, 200, respuesta_fn(resultado))
+    return resultado
+
+
+def _respuesta_reserva(cita):
+    return {'success': True, 'cita_id': cita.id, 'tarotista_id': cita.tarotista_id}
+
+
+def _reservar_cualquier_tarotista(request, data, servicio, clave, responder):
+    """
+    Modo "cualquier tarotista" de reservar_horario: {'inicio'} (hora exacta) o
+    {'inicio', 'fin'} (ventana de inicio). Asigna la tarotista con menos carga.
+    """
+    desde = parse_datetime(str(data.get('inicio')))
+    hasta = parse_datetime(str(data['fin'])) if data.get('fin') else None
+    if desde is None or (data.get('fin') and hasta is None):
+        return responder({'success': False, 'error': 'Fecha inválida (formato ISO).'}, status=400)
+    if timezone.is_naive(desde):
+        desde = timezone.make_aware(desde)
+    if hasta is not None and timezone.is_naive(hasta):
+        hasta = timezone.make_aware(hasta)
+
+    try:
+        cita = _reservar_y_avisar(
+            request.user, clave, lambda: reservar_menos_cargada(request.user, desde, hasta, servicio)
+        )
+    except IntegrityError:
+        repetida = respuesta_guardada(request.user, clave) if clave else None
+        if repetida is None:
+            raise
+        return repetida
+
+    if cita is None:
+        return responder({'success': False, 'error': 'No hay horas libres en ese horario.'}, status=409)
+    return JsonResponse(_respuesta_reserva(cita))
+
+
+# Sesiones que se pueden reservar de una vez
+MAX_SESIONES_CANASTA = 12
+
+
+@csrf_exempt
+@require_POST
+@login_required
+def reservar_canasta(request):
+    """Reserva varias sesiones de una vez (p.ej. lecturas semanales).
+
+    {'evento_ids': [...], 'servicio'}: o quedan todas reservadas o ninguna (un
+    solo UPDATE y bulk_create de las Citas, ver horario_utils.reservar_varios).
+    Responde {'success', 'cita_ids'}; si alguna ya no está disponible, 409 con
+    'no_disponibles'. Se envía un correo resumen al cliente y uno por tarotista.
+    Acepta Idempotency-Key como reservar_horario.
+    """
+    if hasattr(request.user, 'es_tarotista') and request.user.es_tarotista:
+        return JsonResponse(
+            {'success': False, 'error': 'Los tarotistas no pueden agendar horas como clientes.'},
+            status=403
+        )
+
+    clave = request.headers.get('Idempotency-Key')
+    if clave:
+        if len(clave) > MAX_LARGO_CLAVE:
+            return JsonResponse({'success': False, 'error': 'Idempotency-Key demasiado larga.'}, status=400)
+        repetida = respuesta_guardada(request.user, clave)
+        if repetida is not None:
+            return repetida
+
+    def responder(payload, status=200):
+        if clave and es_definitiva(status):
+            try:
+                with transaction.atomic():
+                    guardar_respuesta(request.user, clave, status, payload)
+            except IntegrityError:
+                return respuesta_guardada(request.user, clave)
+        elif clave:
+            # Reintento cruzado con la original (ver reservar_horario)
+            repetida = respuesta_guardada(request.user, clave)
+            if repetida is not None:
+                return repetida
+        return JsonResponse(payload, status=status)
+
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise TypeError
+        ids = list(dict.fromkeys(int(i) for i in data.get('evento_ids') or []))
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Se espera {"evento_ids": [ids]}.'}, status=400)
+    servicio = data.get('servicio', 'basico')
+
+    if servicio not in dict(Cita.SERVICIOS):
+        return responder({'success': False, 'error': 'Servicio inválido.'}, status=400)
+    if not ids:
+        return responder({'success': False, 'error': 'Elige al menos un horario.'}, status=400)
+    if len(ids) > MAX_SESIONES_CANASTA:
+        return responder(
+            {'success': False, 'error': f'Máximo {MAX_SESIONES_CANASTA} sesiones por reserva.'}, status=400
+        )
+
+    horarios = Horario.objects.in_bulk(ids)
+    if len(horarios) != len(ids):
+        return responder({'success': False, 'error': 'Horario no encontrado.'}, status=404)
+    horarios = [horarios[i] for i in ids]
+
+    try:
+        citas = _reservar_y_avisar(
+            request.user, clave,
+            lambda: reservar_varios(horarios, request.user, servicio),
+            correos_fn=lambda citas: _correos_canasta(request.user, citas),
+            respuesta_fn=lambda citas: {'success': True, 'cita_ids': [c.id for c in citas]},
+        )
+    except IntegrityError:
+        repetida = respuesta_guardada(request.user, clave) if clave else None
+        if repetida is None:
+            raise
+        return repetida
+
+    if citas is None:
+        ahora = timezone.now()
+        no_disponibles = list(Horario.objects
+                              .filter(id__in=ids)
+                              .filter(Q(reservado=True) | Q(inicio__lt=ahora)
+                                      | ~sin_retencion_ajena(request.user, ahora))
+                              .values_list('id', flat=True))
+        return responder({
+            'success': False,
+            'error': 'Algunas sesiones ya no están disponibles; no se reservó ninguna.',
+            'no_disponibles': no_disponibles,
+        }, status=409)
+
+    return JsonResponse({'success': True, 'cita_ids': [c.id for c in citas]})
+
+
+def _correos_canasta(cliente, citas):
+    """Un correo resumen para el cliente y uno por tarotista con sus sesiones."""
+    citas = sorted(citas, key=lambda c: c.fecha_hora)
+    tarotistas = Tarotista.objects.select_related('usuario').in_bulk({c.tarotista_id for c in citas})
+    servicios = dict(Cita.SERVICIOS)
+    cliente_nombre = cliente.get_full_name() or cliente.username
+
+    def linea(cita, con):
+        fecha_str = dj_timezone.localtime(cita.fecha_hora).strftime('%d/%m/%Y %H:%M')
+        return f"- {fecha_str} · {servicios.get(cita.servicio, cita.servicio)} · {con}"
+
+    def nombre(tarotista):
+        return tarotista.usuario.get_full_name() or tarotista.usuario.username
+
+    correos = [correo(
+        cliente.email,
+        'Confirmación de tus sesiones',
+        f"Hola {cliente_nombre},\n\n"
+        f"Tus {len(citas)} sesiones fueron reservadas con éxito:\n\n"
+        + "\n".join(linea(c, nombre(tarotistas[c.tarotista_id])) for c in citas)
+        + "\n\nGracias por confiar en Brujitas.",
+    )]
+
+    for tarotista in tarotistas.values():
+        propias = [c for c in citas if c.tarotista_id == tarotista.id]
+        correos.append(correo(
+            tarotista.usuario.email,
+            'Nuevas citas agendadas',
+            f"Hola {nombre(tarotista)},\n\n"
+            f"Tienes {len(propias)} citas nuevas:\n\n"
+            + "\n".join(linea(c, cliente_nombre) for c in propias)
+            + "\n\nPor favor revisa tu panel para más detalles.",
+        ))
+    return correos
+
+
+@csrf_exempt
+@require_POST
+@login_required
+def retener_horario(request):
+    """Retiene un horario por RETENCION_MINUTOS mientras el cliente elige el servicio.
+
+    - {'evento_id'}: lo retiene (soltando la retención anterior del usuario) y
+      responde {'success', 'hasta'}; 409 si está reservado o retenido por otra persona.
+    - {'evento_id', 'soltar': true}: suelta la retención.
+    Las demás personas no ven el horario en el feed hasta que se confirma o vence.
+    """
+    if hasattr(request.user, 'es_tarotista') and request.user.es_tarotista:
+        return JsonResponse(
+            {'success': False, 'error': 'Los tarotistas no pueden agendar horas como clientes.'},
+            status=403
+        )
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
+
+    try:
+        evento_id = int(data.get('evento_id'))
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'ID de evento requerido.'}, status=400)
+
+    if data.get('soltar'):
+        soltar(request.user, horario_id=evento_id)
+        return JsonResponse({'success': True})
+
+    hasta = retener(evento_id, request.user)
+    if hasta is None:
+        return JsonResponse({'success': False, 'error': 'El horario ya no está disponible.'}, status=409)
+
+    return JsonResponse({'success': True, 'hasta': timezone.localtime(hasta).isoformat()})
+
+
+@csrf_exempt
+@require_POST
+@login_required
+def esperar_horario(request):
+    """Lista de espera de una tarotista para un día.
+
+    - {'tarotista_id', 'fecha': 'YYYY-MM-DD'}: entra a la fila (o consulta su
+      lugar si ya estaba) y responde {'success', 'posicion'}. Cuando se libera
+      una hora de ese día, el primero la recibe retenida y un correo.
+    - {'tarotista_id', 'fecha', 'salir': true}: sale de la fila.
+    """
+    if hasattr(request.user, 'es_tarotista') and request.user.es_tarotista:
+        return JsonResponse(
+            {'success': False, 'error': 'Los tarotistas no pueden agendar horas como clientes.'},
+            status=403
+        )
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
+
+    try:
+        fecha = parse_date(str(data.get('fecha') or ''))
+        tarotista = Tarotista.objects.filter(id=int(data.get('tarotista_id')), disponible=True).first()
+    except (TypeError, ValueError):
+        fecha = tarotista = None
+    if fecha is None or tarotista is None:
+        return JsonResponse({'success': False, 'error': 'Tarotista y fecha requeridos.'}, status=400)
+
+    if data.get('salir'):
+        EsperaHorario.objects.filter(usuario=request.user, tarotista=tarotista, fecha=fecha).delete()
+        return JsonResponse({'success': True})
+
+    ahora = timezone.now()
+    del_dia = Horario.objects.filter(
+        tarotista=tarotista,
+        inicio__gte=max(ahora, inicio_dia(fecha)),
+        inicio__lt=inicio_dia(fecha + timedelta(days=1)),
+    )
+    if not del_dia.exists():
+        return JsonResponse({'success': False, 'error': 'La tarotista no tiene horas ese día.'}, status=400)
+    if del_dia.filter(sin_retencion_ajena(request.user, ahora), reservado=False).exists():
+        return JsonResponse({'success': False, 'error': 'Hay horas libres ese día: puedes reservar directamente.'}, status=409)
+
+    espera, _ = EsperaHorario.objects.get_or_create(usuario=request.user, tarotista=tarotista, fecha=fecha)
+    return JsonResponse({'success': True, 'posicion': posicion(espera)})
+
+
+def _correos_reserva(cliente, tarotista, cita):
+    """Correos de confirmación al cliente y al tarotista, para encolar en el outbox."""
+    tarotista_nombre = tarotista.usuario.get_full_name() if hasattr(tarotista, 'usuario') else str(tarotista)
+
+    fecha_hora_aware = cita.fecha_hora
+    if dj_timezone.is_naive(fecha_hora_aware):
+        fecha_hora_aware = dj_timezone.make_aware(fecha_hora_aware, dj_timezone.get_current_timezone())
+
+    fecha_str = dj_timezone.localtime(fecha_hora_aware).strftime('%d/%m/%Y %H:%M')
+    servicio_display = dict(Cita.SERVICIOS).get(cita.servicio, cita.servicio)
+    subject = 'Confirmación de reserva de cita'
+    correos = []
+
+    # Correo para el usuario (solo si tiene email)
+    if getattr(cliente, "email", None):
+        message_usuario = (
+            f"Hola {cliente.get_full_name() or cliente.username},\n\n"
+            f"Tu cita ha sido reservada con éxito.\n\n"
+            f"Tarotista: {tarotista_nombre}\n"
+            f"Fecha y hora: {fecha_str}\n"
+            f"Tipo de servicio: {servicio_display}\n\n"
+            f"Gracias por confiar en Brujitas."
+        )
+        correos.append(correo(cliente.email, subject, message_usuario))
+
+    # Correo para el tarotista (solo si tiene email)
+    if hasattr(tarotista, 'usuario') and getattr(tarotista.usuario, "email", None):
+        message_tarotista = (
+            f"Hola {tarotista_nombre},\n\n"
+            f"Tienes una nueva cita agendada.\n\n"
+            f"Cliente: {cliente.get_full_name() or cliente.username}\n"
+            f"Fecha y hora: {fecha_str}\n"
+            f"Tipo de servicio: {servicio_display}\n\n"
+            f"Por favor revisa tu panel para más detalles."
+        )
+        correos.append(correo(tarotista.usuario.email, subject, message_tarotista))
+
+    return correos
+
+
 # ==================== VISTAS BÁSICAS ====================
 
 def home(request):
@@ -254,44 +587,130 @@ def eliminar_reporte(request, reporte_id):
 
 # ==================== DISPONIBILIDAD ====================
 
+# Máximo de días que se proyectan por petición (FullCalendar pide una semana o un mes)
+MAX_DIAS_RANGO = 366
+
+
+def _parse_fecha_param(valor):
+    """Convierte el start/end de FullCalendar (ISO, con o sin zona) a fecha local."""
+    if not valor:
+        return None
+    try:
+        dt = parse_datetime(valor)
+    except ValueError:
+        dt = None
+    if dt is not None:
+        if timezone.is_aware(dt):
+            dt = timezone.localtime(dt)
+        return dt.date()
+    try:
+        return parse_date(valor[:10])
+    except ValueError:
+        return None
+
+
+def _rango_solicitado(request):
+    """Rango [desde, hasta) pedido por FullCalendar; por defecto, los próximos 7 días."""
+    hoy = timezone.localdate()
+    desde = _parse_fecha_param(request.GET.get('start')) or hoy
+    hasta = _parse_fecha_param(request.GET.get('end')) or desde + timedelta(days=7)
+    if hasta <= desde:
+        hasta = desde + timedelta(days=1)
+    if (hasta - desde).days > MAX_DIAS_RANGO:
+        hasta = desde + timedelta(days=MAX_DIAS_RANGO)
+    return desde, hasta
+
+
+def _evento_horario(h, **extra):
+    """Evento FullCalendar para un Horario (inicio/fin en hora local con offset)."""
+    return {
+        'id': h.id,
+        'start': timezone.localtime(h.inicio).isoformat(),
+        'end': timezone.localtime(h.fin).isoformat(),
+        'is_reserved': h.reservado,
+        **extra,
+    }
+
+
+def _evento_fila(fila, **extra):
+    """Igual que _evento_horario, desde una fila values_list (id, tarotista_id, inicio, fin, ...)."""
+    return {
+        'id': fila[0],
+        'start': timezone.localtime(fila[2]).isoformat(),
+        'end': timezone.localtime(fila[3]).isoformat(),
+        'tarotista_id': fila[1],
+        **extra,
+    }
+
+
+def _filas_compactas(filas, base, ocupado, tarotistas, nombre_tarotista):
+    """
+    Formato compacto del feed: cada tarotista va una sola vez en 'tarotistas' como
+    [id, nombre, color] y cada horario es una tupla
+    [id, índice del tarotista, minutos desde 'base', duración en minutos, estado]
+    (estado 0 = disponible, 1 = ocupado). 'base' es la medianoche local del
+    primer día pedido, en milisegundos epoch.
+    Genera las tuplas de `filas` y agrega a `tarotistas` los que aún no están.
+    """
+    indices = {t[0]: i for i, t in enumerate(tarotistas)}
+    estado = 1 if ocupado else 0
+
+    for fila in filas:
+        horario_id, tarotista_id, inicio, fin = fila[:4]
+        indice = indices.get(tarotista_id)
+        if indice is None:
+            indice = indices[tarotista_id] = len(tarotistas)
+            tarotistas.append([tarotista_id, nombre_tarotista(fila), _color_tarotista(tarotista_id)])
+        yield [
+            horario_id,
+            indice,
+            int((inicio - base).total_seconds()) // 60,
+            int((fin - inicio).total_seconds()) // 60,
+            estado,
+        ]
+
+
 @login_required
 def calendario_disponibilidad_view(request):
     if not hasattr(request.user, 'tarotista'):
         messages.error(request, 'Solo tarotistas.')
         return redirect('home')
 
-    horarios = Disponibilidad.objects.filter(tarotista=request.user.tarotista)
-    today = timezone.now().date()
-    eventos = []
+    desde, hasta = _rango_solicitado(request)
 
-    # JS getDay(): 0=Sunday .. 6=Saturday
-    # Python weekday(): 0=Monday .. 6=Sunday
-    js_today = (today.weekday() + 1) % 7
+    horarios = Horario.objects.filter(
+        tarotista=request.user.tarotista,
+        inicio__gte=inicio_dia(desde),
+        inicio__lt=inicio_dia(hasta),
+    )
 
-    for h in horarios:
-        dias_hasta = (h.dia_semana - js_today) % 7
-        fecha = today + timedelta(days=dias_hasta)
+    def evento(h):
+        return _evento_horario(
+            h,
+            title='Reservado' if h.reservado else 'Disponible',
+            color='#dc3545' if h.reservado else '#28a745',
+            disponibilidad_id=h.disponibilidad_id,
+        )
 
-        start_dt = datetime.combine(fecha, h.hora_inicio)
-        end_dt = datetime.combine(fecha, h.hora_fin)
+    # FullCalendar vuelve a pedir los eventos (con start/end) al navegar;
+    # se envían por partes leyendo los horarios con iterator()
+    if 'start' in request.GET:
+        return respuesta_json_stream(arreglo_json(
+            evento(h) for h in horarios.iterator(chunk_size=2000)
+        ))
 
-        eventos.append({
-            'id': h.id,
-            'title': 'Reservado' if h.reservado else 'Disponible',
-            'start': start_dt.isoformat(),
-            'end': end_dt.isoformat(),
-            'color': '#dc3545' if h.reservado else '#28a745',
-            'is_reserved': h.reservado
-        })
+    eventos = [evento(h) for h in horarios]
 
     has_tarotista = hasattr(request.user, 'tarotista')
     tarotista_id = request.user.tarotista.id if has_tarotista else None
 
+    total, libres, reservados = contar_horarios(tarotista_id)
+
     context = {
         'horarios_eventos_json': json.dumps(eventos),
-        'total_horarios': horarios.count(),
-        'horarios_disponibles': horarios.filter(reservado=False).count(),
-        'horarios_reservados': horarios.filter(reservado=True).count(),
+        'total_horarios': total,
+        'horarios_disponibles': libres,
+        'horarios_reservados': reservados,
         'debug_has_tarotista': has_tarotista,
         'debug_tarotista_id': tarotista_id,
     }
@@ -310,33 +729,39 @@ def manejar_disponibilidad_ajax(request):
     if data.get('action') == 'add':
         dia = int(data['dia_semana'])
         start_dt = datetime.fromisoformat(data['start_time'])
+        # El cliente manda toISOString() (UTC); las reglas se guardan en hora local
+        if timezone.is_aware(start_dt):
+            start_dt = timezone.localtime(start_dt)
 
         blocks = int(data.get('blocks', 1))
 
-        existing_ids = []
-        block_objs = []
+        pedidos = [(start_dt + timedelta(minutes=30 * i)).time() for i in range(blocks)]
+        pedidos_fin = [(start_dt + timedelta(minutes=30 * (i + 1))).time() for i in range(blocks)]
 
-        for i in range(blocks):
-            b_start = start_dt + timedelta(minutes=30 * i)
-            b_end = b_start + timedelta(minutes=30)
+        # Bloques ya guardados ese día, ordenados por inicio (una sola consulta, a lo más 48 filas)
+        existentes = list(Disponibilidad.objects
+                          .filter(tarotista=tarotista, dia_semana=dia)
+                          .order_by('hora_inicio', 'hora_fin'))
+        exactos = {(b.hora_inicio, b.hora_fin): b for b in existentes}
+        inicios = [b.hora_inicio for b in existentes]
 
-            exact = Disponibilidad.objects.filter(
-                tarotista=tarotista,
-                dia_semana=dia,
-                hora_inicio=b_start.time(),
-                hora_fin=b_end.time()
-            ).first()
+        # fin_max[k] = mayor hora_fin entre los k primeros bloques por inicio
+        fin_max = [None]
+        for b in existentes:
+            fin_max.append(b.hora_fin if fin_max[-1] is None else max(fin_max[-1], b.hora_fin))
+
+        existing_blocks = []
+        block_objs = []
 
+        for b_start, b_end in zip(pedidos, pedidos_fin):
+            exact = exactos.get((b_start, b_end))
             if exact:
-                existing_ids.append(exact.id)
+                existing_blocks.append(exact)
                 continue
 
-            solapado = Disponibilidad.objects.filter(
-                tarotista=tarotista,
-                dia_semana=dia,
-                hora_inicio__lt=b_end.time(),
-                hora_fin__gt=b_start.time()
-            ).exists()
+            # Solapa si algún bloque que parte antes de b_end termina después de b_start
+            k = bisect_left(inicios, b_end)
+            solapado = fin_max[k] is not None and fin_max[k] > b_start
 
             if solapado:
                 return JsonResponse({'success': False, 'error': 'Horario solapado en alguno de los bloques'}, status=409)
@@ -344,165 +769,348 @@ def manejar_disponibilidad_ajax(request):
             block_objs.append(Disponibilidad(
                 tarotista=tarotista,
                 dia_semana=dia,
-                hora_inicio=b_start.time(),
-                hora_fin=b_end.time()
+                hora_inicio=b_start,
+                hora_fin=b_end
             ))
 
         created = []
         if block_objs:
             created = Disponibilidad.objects.bulk_create(block_objs)
-
-        all_blocks = [c.id for c in created]
-        all_blocks.extend(existing_ids)
-
-        events = []
-        today = timezone.now().date()
-        js_today = (today.weekday() + 1) % 7
-
-        for bid in all_blocks:
-            try:
-                b = Disponibilidad.objects.get(id=bid)
-            except Disponibilidad.DoesNotExist:
-                continue
-
-            dias_hasta = (b.dia_semana - js_today) % 7
-            fecha = today + timedelta(days=dias_hasta)
-
-            start_dt_block = datetime.combine(fecha, b.hora_inicio)
-            end_dt_block = datetime.combine(fecha, b.hora_fin)
-
-            events.append({
-                'id': b.id,
-                'start': start_dt_block.isoformat(),
-                'end': end_dt_block.isoformat(),
-                'title': 'Ocupado' if b.reservado else 'Disponible',
-                'color': '#dc3545' if b.reservado else '#28a745',
-                'is_reserved': b.reservado
-            })
+            # bulk_create no dispara post_save
+            invalidar_disponibilidad()
+            materializar(created)
+
+        # Horarios fechados (desde ahora) de los bloques creados o ya existentes
+        horarios = Horario.objects.filter(
+            disponibilidad__in=[b.id for b in created + existing_blocks],
+            inicio__gte=timezone.now(),
+        )
+        events = [
+            _evento_horario(
+                h,
+                title='Ocupado' if h.reservado else 'Disponible',
+                color='#dc3545' if h.reservado else '#28a745',
+                disponibilidad_id=h.disponibilidad_id,
+            )
+            for h in horarios
+        ]
 
         return JsonResponse({'success': True, 'events': events})
 
     if data.get('action') == 'delete':
+        # Elimina la regla semanal y sus horarios libres; los reservados se conservan
         Disponibilidad.objects.get(
             id=data['event_id'],
-            tarotista=tarotista,
-            reservado=False
+            tarotista=tarotista
         ).delete()
         return JsonResponse({'success': True})
 
     return JsonResponse({'success': False}, status=400)
 
 
+# Paleta de colores estable por tarotista
+PALETA_TAROTISTAS = [
+    '#4e79a7',  # azul
+    '#f28e2b',  # naranjo
+    '#59a14f',  # verde
+    '#b07aa1',  # morado
+    '#76b7b2',  # turquesa
+    '#edc948',  # amarillo
+    '#e15759',  # rojo suave
+    '#9c755f',  # cafe
+    '#bab0ac',  # gris
+]
+
+
+def _color_tarotista(tarotista_id: int) -> str:
+    try:
+        return PALETA_TAROTISTAS[int(tarotista_id) % len(PALETA_TAROTISTAS)]
+    except Exception:
+        return '#28a745'
+
+
+def _rango_feed(request):
+    """Q sobre inicio para el rango pedido (sin días pasados) y la medianoche base."""
+    hoy = timezone.localdate()
+    desde, hasta = _rango_solicitado(request)
+    base = inicio_dia(max(desde, hoy))
+    return Q(inicio__gte=base, inicio__lt=inicio_dia(hasta)), base
+
+
+def _inicios_contiguos(libres, minutos, bloque):
+    """
+    Solo los horarios libres desde los que hay `minutos` seguidos libres del
+    mismo tarotista (para servicios de varios bloques). `bloque(item)` da
+    (tarotista, inicio, fin) de cada elemento; el siguiente bloque de una
+    racha es el que empieza en el fin del anterior.
+    """
+    libres = list(libres)
+    fines = {}
+    for item in libres:
+        tarotista, inicio, fin = bloque(item)
+        fines[(tarotista, inicio)] = max(fin, fines.get((tarotista, inicio), fin))
+
+    for item in libres:
+        tarotista, inicio, fin = bloque(item)
+        hasta = inicio + minutos
+        while fin < hasta and (tarotista, fin) in fines:
+            fin = fines[(tarotista, fin)]
+        if fin >= hasta:
+            yield item
+
+
+# Rangos hasta este largo (semana o mes del calendario) se cachean completos;
+# los más largos se leen con iterator() y se envían por partes sin cachear.
+DIAS_SNAPSHOT = 42
+
+
+def _feed_horarios(request, compacto):
+    """
+    Contenido del feed y el cursor de cambios del snapshot: aplicando los
+    cambios posteriores a ese cursor (horarios_cambios) el cliente queda al día.
+    Retorna un iterable de eventos, o en formato compacto los pares
+    (clave, valor) del objeto (ver _filas_compactas), para json_utils.
+    """
+    hoy = timezone.localdate()
+    desde, hasta = _rango_solicitado(request)
+    rango, base = _rango_feed(request)
+
+    user = request.user
+    es_tarotista = hasattr(user, 'tarotista')
+
+    campos = ('id', 'tarotista_id', 'inicio', 'fin',
+              'tarotista__usuario__first_name', 'tarotista__usuario__last_name',
+              'tarotista__usuario__username')
+
+    nombres = {}
+
+    def nombre_tarotista(fila):
+        # Se calcula una vez por tarotista, no por cada horario
+        tarotista_id = fila[1]
+        if tarotista_id not in nombres:
+            nombre = f"{fila[4]} {fila[5]}".strip()
+            nombres[tarotista_id] = nombre or fila[6]
+        return nombres[tarotista_id]
+
+    def eventos_libres(filas):
+        for fila in filas:
+            yield _evento_fila(
+                fila,
+                is_reserved=False,
+                title='Disponible',
+                color=_color_tarotista(fila[1]),
+                tarotista_nombre=nombre_tarotista(fila),
+            )
+
+    # === DISPONIBLES (snapshot público cacheado) ===
+    # El cursor se lee antes que los horarios: lo que cambie entremedio
+    # vuelve a llegar como cambio y el cliente lo aplica de nuevo sin efecto.
+    libres = Horario.objects.filter(rango, reservado=False).values_list(*campos)
+    tarotistas = []
+
+    if (hasta - desde).days <= DIAS_SNAPSHOT:
+        formato = 'compacto' if compacto else 'eventos'
+        cache_key = snapshot_key('libres', formato, hoy, desde, hasta, version=version_de(request))
+        snapshot = cache.get(cache_key)
+
+        if snapshot is None:
+            cursor = cursor_actual()
+            if compacto:
+                horarios = list(_filas_compactas(libres, base, False, tarotistas, nombre_tarotista))
+                snapshot = (cursor, tarotistas, horarios)
+            else:
+                snapshot = (cursor, [], list(eventos_libres(libres)))
+            cache.set(cache_key, snapshot, SNAPSHOT_TIMEOUT)
+
+        cursor, tarotistas, libres = snapshot
+        tarotistas = list(tarotistas)
+    else:
+        cursor = cursor_actual()
+        filas = libres.iterator(chunk_size=2000)
+        if compacto:
+            libres = _filas_compactas(filas, base, False, tarotistas, nombre_tarotista)
+        else:
+            libres = eventos_libres(filas)
+
+    # Los retenidos por otras personas se omiten al escribir (el snapshot es público)
+    ocultos = horarios_ocultos(user, version_de(request))
+    if ocultos:
+        if compacto:
+            libres = (h for h in libres if h[0] not in ocultos)
+        else:
+            libres = (e for e in libres if e['id'] not in ocultos)
+
+    # ?servicio=completo: solo las horas de inicio con bloques seguidos suficientes
+    minutos = minutos_servicio(request.GET['servicio']) if request.GET.get('servicio') else None
+    if minutos:
+        if compacto:
+            libres = _inicios_contiguos(libres, minutos, lambda h: (h[1], h[2], h[2] + h[3]))
+        else:
+            def bloque(e):
+                inicio = datetime.fromisoformat(e['start'])
+                fin = datetime.fromisoformat(e['end'])
+                return e['tarotista_id'], inicio, fin
+            libres = _inicios_contiguos(libres, timedelta(minutes=minutos), bloque)
+
+    # === OCUPADOS (visibilidad restringida) ===
+    # Solo el cliente dueño de la cita o el tarotista dueño del bloque los ven;
+    # el filtro va en la BD usando el enlace Horario.cita.
+    if user.is_authenticated:
+        visibles = Q(cita__cliente_id=user.id)
+        if es_tarotista:
+            visibles |= Q(tarotista_id=user.tarotista.id)
+
+        reservados = (Horario.objects
+                      .filter(rango, reservado=True, cita__isnull=False)
+                      .filter(visibles)
+                      .values_list(*campos))
+    else:
+        reservados = Horario.objects.none()
+
+    if compacto:
+        # 'tarotistas' va al final: se completa mientras se escriben los horarios
+        horarios = chain(libres, _filas_compactas(reservados, base, True, tarotistas, nombre_tarotista))
+        return [('base', int(base.timestamp() * 1000)), ('horarios', horarios), ('tarotistas', tarotistas)], cursor
+
+    ocupados = (
+        _evento_fila(
+            fila,
+            is_reserved=True,
+            title='Ocupado',
+            color='#dc3545',
+            tarotista_nombre=nombre_tarotista(fila),
+        )
+        for fila in reservados
+    )
+    return chain(libres, ocupados), cursor
+
+
 @require_GET
+@condition(etag_func=lambda request: etag_disponibilidad(
+    request, sorted(horarios_ocultos(request.user, version_de(request)))))
 def horarios_disponibles_json(request):
     """Devuelve eventos FullCalendar.
 
     - Disponibles: se muestran a todos los usuarios (no tarotistas) y se colorean por tarotista.
     - Ocupados: se muestran solo al cliente dueño de la cita o al tarotista dueño del bloque.
+    - Solo se devuelven los Horario dentro del rango start/end que envía FullCalendar al navegar.
+    - Los disponibles se cachean por versión del calendario; la respuesta lleva ETag y
+      un refetch sin cambios recibe 304 sin cuerpo.
+    - El header X-Cambios-Cursor es el cursor para pedir luego solo los cambios (horarios_cambios).
+    - El JSON se escribe por partes (json_utils), sin armar la respuesta completa en memoria.
+    - Con ?servicio=<clave> solo van los disponibles desde los que alcanzan los
+      bloques seguidos que dura ese servicio (Cita.DURACION_SERVICIO).
 
     IMPORTANTE: Este endpoint responde una LISTA (no un dict) porque FullCalendar acepta un array JSON.
+    Con ?formato=compacto responde el formato de diccionario de _filas_compactas, que el
+    calendario de agendar_cita expande en el navegador.
     """
+    if request.GET.get('formato') == 'compacto':
+        pares, cursor = _feed_horarios(request, compacto=True)
+        response = respuesta_json_stream(objeto_json(pares))
+    else:
+        eventos, cursor = _feed_horarios(request, compacto=False)
+        response = respuesta_json_stream(arreglo_json(eventos))
 
-    # Paleta de colores estable por tarotista
-    palette = [
-        '#4e79a7',  # azul
-        '#f28e2b',  # naranjo
-        '#59a14f',  # verde
-        '#b07aa1',  # morado
-        '#76b7b2',  # turquesa
-        '#edc948',  # amarillo
-        '#e15759',  # rojo suave
-        '#9c755f',  # cafe
-        '#bab0ac',  # gris
-    ]
-
-    def color_tarotista(tarotista_id: int) -> str:
-        try:
-            return palette[int(tarotista_id) % len(palette)]
-        except Exception:
-            return '#28a745'
-
-    eventos = []
-    today = timezone.now().date()
-    js_today = (today.weekday() + 1) % 7
+    response['X-Cambios-Cursor'] = str(cursor)
+    # El navegador debe revalidar siempre con el ETag (respuesta distinta por usuario)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-    user = request.user
-    es_tarotista = hasattr(user, 'tarotista')
 
-    # === DISPONIBLES ===
-    libres = (Disponibilidad.objects
-              .select_related('tarotista', 'tarotista__usuario')
-              .filter(reservado=False))
+@require_GET
+def horarios_cambios(request):
+    """Cambios de horarios desde ?cursor=N para el rango start/end.
+
+    - Responde {'completo': False, 'cursor', 'tarotistas', 'cambios'}; cada cambio es
+      {'tipo', 'id', 'tarotista_id', 'start', 'end'} y se aplica en orden
+      (agregado/liberado: el horario queda disponible; reservado/eliminado/retenido: se quita).
+    - Si el cursor falta, ya se podó o hay demasiados cambios, responde
+      {'completo': True, 'cursor', ...feed compacto} para reemplazar todo.
+    - Los ocupados propios no viajan como cambio: vienen en el snapshot.
+    """
+    try:
+        cursor = int(request.GET['cursor'])
+    except (KeyError, ValueError):
+        cursor = None
+
+    rango, _ = _rango_feed(request)
+    cambios = cambios_desde(cursor, rango) if cursor is not None else None
+
+    if cambios is None:
+        pares, cursor = _feed_horarios(request, compacto=True)
+        response = respuesta_json_stream(objeto_json([('completo', True), ('cursor', cursor), *pares]))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    # Un horario que vuelve a quedar libre pero otra persona retiene se informa como retenido
+    ocultos = horarios_ocultos(request.user, version_de(request))
+
+    tarotistas = {}
+    ids = {c.tarotista_id for c in cambios}
+    if ids:
+        for tarotista_id, first_name, last_name, username in (Tarotista.objects
+                .filter(id__in=ids)
+                .values_list('id', 'usuario__first_name', 'usuario__last_name', 'usuario__username')):
+            nombre = f"{first_name} {last_name}".strip() or username
+            tarotistas[tarotista_id] = [nombre, _color_tarotista(tarotista_id)]
+
+    response = JsonResponse({
+        'completo': False,
+        # Nunca retrocede: si no hay cambios "asentados" nuevos se mantiene el del cliente
+        'cursor': max(cursor, cursor_actual()),
+        'tarotistas': tarotistas,
+        'cambios': [
+            {
+                'tipo': 'retenido' if c.horario_id in ocultos and c.tipo in ('agregado', 'liberado') else c.tipo,
+                'id': c.horario_id,
+                'tarotista_id': c.tarotista_id,
+                'start': timezone.localtime(c.inicio).isoformat(),
+                'end': timezone.localtime(c.fin).isoformat(),
+            }
+            for c in cambios
+        ],
+    })
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# Cada cuántos segundos se manda un comentario para mantener viva la conexión
+STREAM_PING_SEGUNDOS = 25
 
-    for h in libres:
-        dias_hasta = (h.dia_semana - js_today) % 7
-        fecha = today + timedelta(days=dias_hasta)
-        start_dt = datetime.combine(fecha, h.hora_inicio)
-        end_dt = datetime.combine(fecha, h.hora_fin)
 
-        tarotista_nombre = None
-        try:
-            tarotista_nombre = h.tarotista.usuario.get_full_name() or h.tarotista.usuario.username
-        except Exception:
-            tarotista_nombre = str(h.tarotista)
-
-        eventos.append({
-            'id': h.id,
-            'title': 'Disponible',
-            'start': start_dt.isoformat(),
-            'end': end_dt.isoformat(),
-            'color': color_tarotista(h.tarotista_id),
-            'is_reserved': False,
-            'tarotista_id': h.tarotista_id,
-            'tarotista_nombre': tarotista_nombre,
-        })
+@require_GET
+async def horarios_stream(request):
+    """Server-Sent Events con los cambios de horarios para los calendarios abiertos.
+
+    - Eventos: agregado, eliminado, reservado, liberado (y resync si el cliente se atrasa).
+    - Requiere servidor ASGI (Brujitas/asgi.py): cada cliente es una corrutina en espera.
+      Bajo WSGI responde 204, que le indica al EventSource que no reintente; agendar_cita
+      ni siquiera lo abre y pide horarios_cambios cada 30 s (ver stream_utils.stream_disponible).
+    - El reparto es en memoria (sin broker externo): llega a los clientes del mismo proceso.
+    """
+    if not stream_disponible(request):
+        return HttpResponse(status=204)
 
-    # === OCUPADOS (visibilidad restringida) ===
-    reservados = (Disponibilidad.objects
-                  .select_related('tarotista', 'tarotista__usuario')
-                  .filter(reservado=True))
-
-    for h in reservados:
-        mostrar = False
-
-        cita = Cita.objects.filter(
-            tarotista=h.tarotista,
-            fecha_hora__date=today + timedelta(days=(h.dia_semana - js_today) % 7),
-            fecha_hora__time=h.hora_inicio
-        ).first()
-
-        if cita:
-            if user.is_authenticated and cita.cliente_id == getattr(user, 'id', None):
-                mostrar = True
-            if es_tarotista and h.tarotista_id == getattr(user.tarotista, 'id', None):
-                mostrar = True
-
-        if not mostrar:
-            continue
-
-        dias_hasta = (h.dia_semana - js_today) % 7
-        fecha = today + timedelta(days=dias_hasta)
-        start_dt = datetime.combine(fecha, h.hora_inicio)
-        end_dt = datetime.combine(fecha, h.hora_fin)
-
-        tarotista_nombre = None
+    async def eventos():
+        suscripcion = suscribir()
+        _, cola = suscripcion
         try:
-            tarotista_nombre = h.tarotista.usuario.get_full_name() or h.tarotista.usuario.username
-        except Exception:
-            tarotista_nombre = str(h.tarotista)
-
-        eventos.append({
-            'id': h.id,
-            'title': 'Ocupado',
-            'start': start_dt.isoformat(),
-            'end': end_dt.isoformat(),
-            'color': '#dc3545',
-            'is_reserved': True,
-            'tarotista_id': h.tarotista_id,
-            'tarotista_nombre': tarotista_nombre,
-        })
-
-    return JsonResponse(eventos, safe=False)
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    mensaje = await asyncio.wait_for(cola.get(), timeout=STREAM_PING_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                yield f"event: {mensaje['tipo']}\ndata: {json.dumps(mensaje)}\n\n"
+        finally:
+            desuscribir(suscripcion)
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 def toma_de_horas(request):
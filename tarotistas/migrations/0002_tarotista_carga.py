@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+def contar_cargas(apps, schema_editor):
+    Tarotista = apps.get_model('tarotistas', 'Tarotista')
+    activas = Q(citas_tarotista__estado__in=['pendiente', 'confirmada'],
+                citas_tarotista__fecha_hora__gte=timezone.now())
+    for tarotista_id, carga in (Tarotista.objects
+                                .annotate(n=Count('citas_tarotista', filter=activas))
+                                .values_list('id', 'n')):
+        Tarotista.objects.filter(id=tarotista_id).update(carga=carga)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarotistas', '0001_initial'),
+        ('citas', '0003_cita_unica_sin_canceladas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarotista',
+            name='carga',
+            field=models.PositiveIntegerField(default=0, help_text='Citas próximas activas'),
+        ),
+        migrations.AddIndex(
+            model_name='tarotista',
+            index=models.Index(fields=['disponible', 'carga'], name='tarotistas__disponi_a0cb2c_idx'),
+        ),
+        migrations.RunPython(contar_cargas, migrations.RunPython.noop),
+    ]
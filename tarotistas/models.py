@@ -9,6 +9,14 @@ class Tarotista(models.Model):
     )
     descripcion = models.TextField(help_text="Bio profesional")
     disponible = models.BooleanField(default=True)
+    # Contador para asignar "cualquier tarotista" sin contar citas en cada reserva:
+    # lo suben/bajan reservar y liberar_horarios, y el cron lo recalcula
+    carga = models.PositiveIntegerField(default=0, help_text="Citas próximas activas")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['disponible', 'carga']),
+        ]
 
     def __str__(self):
         return f"Tarotista: {self.usuario.get_full_name()}"
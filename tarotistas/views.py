@@ -87,9 +87,10 @@ def calendario(request):
         print('DEBUG [tarotistas.views.calendario] tarotista: NO ASOCIADO')
 
     import json
-    from core.models import Disponibilidad
+    from core.models import Horario
+    from core.horario_utils import contar_horarios
     from django.utils import timezone
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     eventos = []
     has_tarotista = hasattr(request.user, 'tarotista')
     tarotista_id = request.user.tarotista.id if has_tarotista else None
@@ -97,26 +98,26 @@ def calendario(request):
         from django.contrib import messages
         messages.error(request, 'Solo tarotistas.')
         return redirect('core:home')
-    horarios = Disponibilidad.objects.filter(tarotista=request.user.tarotista)
-    today = timezone.now().date()
-    js_today = (today.weekday() + 1) % 7
+    ahora = timezone.now()
+    horarios = Horario.objects.filter(
+        tarotista=request.user.tarotista,
+        inicio__gte=ahora,
+        inicio__lt=ahora + timedelta(days=7),
+    )
     for h in horarios:
-        dias_hasta = (h.dia_semana - js_today) % 7
-        fecha = today + timedelta(days=dias_hasta)
-        start_dt = datetime.combine(fecha, h.hora_inicio)
-        end_dt = datetime.combine(fecha, h.hora_fin)
         eventos.append({
             'id': h.id,
             'title': 'Reservado' if h.reservado else 'Disponible',
-            'start': start_dt.isoformat(),
-            'end': end_dt.isoformat(),
+            'start': timezone.localtime(h.inicio).isoformat(),
+            'end': timezone.localtime(h.fin).isoformat(),
             'backgroundColor': '#dc3545' if h.reservado else '#28a745'
         })
+    contadores = contar_horarios(tarotista_id)
     context = {
         'horarios_eventos_json': json.dumps(eventos),
-        'total_horarios': horarios.count(),
-        'horarios_disponibles': horarios.filter(reservado=False).count(),
-        'horarios_reservados': horarios.filter(reservado=True).count(),
+        'total_horarios': contadores[0],
+        'horarios_disponibles': contadores[1],
+        'horarios_reservados': contadores[2],
         'debug_has_tarotista': has_tarotista,
         'debug_tarotista_id': tarotista_id,
     }
@@ -0,0 +1,100 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CorreoPendiente
+
+
+# Reintentos: 30 s, 1 min, 2 min, ... hasta 1 h entre intentos
+BACKOFF_BASE_SEGUNDOS = 30
+BACKOFF_MAX_SEGUNDOS = 3600
+MAX_INTENTOS = 8
+# Tiempo que un worker tiene tomado un lote antes de que otro lo pueda retomar
+BLOQUEO_MINUTOS = 10
+
+
+def correo(destinatarios, asunto, texto, html=""):
+    """Correo sin guardar; se encola con encolar()."""
+    if isinstance(destinatarios, str):
+        destinatarios = [destinatarios]
+    destinatarios = [d for d in destinatarios if d]
+    return CorreoPendiente(destinatarios=destinatarios, asunto=asunto, texto=texto, html=html or "")
+
+
+def encolar(*correos):
+    """
+    Guarda los correos en el outbox con un solo INSERT. Llamar dentro de la
+    transacción del cambio que los origina: si esta se revierte, no salen.
+    """
+    correos = [c for c in correos if c is not None and c.destinatarios]
+    if correos:
+        CorreoPendiente.objects.bulk_create(correos)
+    return len(correos)
+
+
+def reclamar_lote(tamano):
+    """
+    Toma hasta `tamano` correos listos para enviar marcándolos con un lote
+    propio (UPDATE condicional), así varios workers no envían el mismo.
+    """
+    ahora = timezone.now()
+    disponibles = (Q(estado="pendiente", proximo_intento__lte=ahora)
+                   & (Q(bloqueado_hasta__isnull=True) | Q(bloqueado_hasta__lt=ahora)))
+
+    ids = list(CorreoPendiente.objects
+               .filter(disponibles)
+               .order_by("proximo_intento")
+               .values_list("id", flat=True)[:tamano])
+    if not ids:
+        return []
+
+    lote = uuid.uuid4().hex
+    CorreoPendiente.objects.filter(disponibles, id__in=ids).update(
+        lote=lote,
+        bloqueado_hasta=ahora + timedelta(minutes=BLOQUEO_MINUTOS),
+    )
+    return list(CorreoPendiente.objects.filter(lote=lote))
+
+
+def enviar(pendiente):
+    """Envía un correo con el EMAIL_BACKEND global (SendGrid). Lanza excepción si falla."""
+    mensaje = EmailMultiAlternatives(
+        pendiente.asunto,
+        pendiente.texto,
+        settings.DEFAULT_FROM_EMAIL,
+        pendiente.destinatarios,
+        connection=get_connection(fail_silently=False),
+    )
+    if pendiente.html:
+        mensaje.attach_alternative(pendiente.html, "text/html")
+    if not mensaje.send():
+        raise RuntimeError("El backend no aceptó el correo")
+
+
+def registrar_resultado(pendiente, error=None):
+    """Marca el correo como enviado, o agenda el reintento con backoff exponencial."""
+    ahora = timezone.now()
+    pendiente.lote = ""
+    pendiente.bloqueado_hasta = None
+
+    if error is None:
+        pendiente.estado = "enviado"
+        pendiente.enviado = ahora
+        pendiente.ultimo_error = ""
+    else:
+        pendiente.intentos += 1
+        pendiente.ultimo_error = str(error)[:1000]
+        if pendiente.intentos >= MAX_INTENTOS:
+            pendiente.estado = "fallido"
+        else:
+            espera = min(BACKOFF_BASE_SEGUNDOS * 2 ** (pendiente.intentos - 1), BACKOFF_MAX_SEGUNDOS)
+            pendiente.proximo_intento = ahora + timedelta(seconds=espera)
+
+    pendiente.save(update_fields=[
+        "estado", "enviado", "intentos", "proximo_intento",
+        "lote", "bloqueado_hasta", "ultimo_error",
+    ])
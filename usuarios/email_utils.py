@@ -1,80 +1,15 @@
-import sys
-import traceback
-import requests
-
-from django.conf import settings
 from django.urls import reverse
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
 
-
-def _send_email_via_sendgrid(to_email: str, subject: str, plain_text: str = None, html_text: str = None) -> bool:
-    """
-    Envía correo vía SendGrid Web API v3.
-    Requiere:
-      - settings.SENDGRID_API_KEY
-      - settings.SENDGRID_FROM_EMAIL (debe estar verificado en SendGrid)
-    Ahora soporta HTML para emails más estéticos.
-    """
-    api_key = getattr(settings, "SENDGRID_API_KEY", "").strip()
-    from_email = getattr(settings, "SENDGRID_FROM_EMAIL", "").strip()
-
-    if not api_key:
-        print("[MAIL][SENDGRID] ERROR: SENDGRID_API_KEY no configurada", flush=True)
-        return False
-
-    if not from_email:
-        print("[MAIL][SENDGRID] ERROR: SENDGRID_FROM_EMAIL no configurada", flush=True)
-        return False
-
-    url = "https://api.sendgrid.com/v3/mail/send"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-
-    # Construye el contenido: Incluye texto plano y/o HTML si están disponibles
-    content = []
-    if plain_text and plain_text.strip():
-        content.append({"type": "text/plain", "value": plain_text.strip()})
-    if html_text and html_text.strip():
-        content.append({"type": "text/html", "value": html_text.strip()})
-
-    if not content:
-        print("[MAIL][SENDGRID] ERROR: No hay contenido válido para enviar", flush=True)
-        return False
-
-    payload = {
-        "personalizations": [{"to": [{"email": to_email}]}],
-        "from": {"email": from_email, "name": "Brujitas"},
-        "subject": subject,
-        "content": content,
-    }
-
-    try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=20)
-        if 200 <= resp.status_code < 300:
-            print(f"[MAIL][SENDGRID] OK -> enviado a {to_email}", flush=True)
-            return True
-
-        print(
-            f"[MAIL][SENDGRID] ERROR status={resp.status_code} body={resp.text[:500]}",
-            flush=True,
-        )
-        return False
-
-    except Exception as e:
-        print("[MAIL][SENDGRID] EXCEPTION:", repr(e), flush=True)
-        traceback.print_exc(file=sys.stdout)
-        sys.stdout.flush()
-        return False
+from .correo_utils import correo, encolar
 
 
 def enviar_email_verificacion(usuario, request) -> bool:
     """
-    Envía correo de verificación con link de activación.
-    Retorna True/False según si SendGrid aceptó la solicitud.
+    Encola el correo de verificación con link de activación.
+    Retorna True si quedó en el outbox.
     Ahora usa HTML para un diseño estético con botón.
     """
     subject = "Verifica tu correo electrónico"
@@ -127,7 +62,8 @@ def enviar_email_verificacion(usuario, request) -> bool:
     </html>
     """
 
-    print("[MAIL] enviar_email_verificacion() -> SendGrid (con HTML estético)", flush=True)
-    return _send_email_via_sendgrid(usuario.email, subject, plain_text, html_text)
+    # Queda en el outbox (misma transacción que el registro); lo envía manage.py enviar_correos
+    print("[MAIL] enviar_email_verificacion() -> outbox (con HTML estético)", flush=True)
+    return encolar(correo(usuario.email, subject, plain_text.strip(), html_text.strip())) > 0
 
 
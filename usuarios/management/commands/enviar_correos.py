@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from usuarios.correo_utils import enviar, reclamar_lote, registrar_resultado
+
+
+class Command(BaseCommand):
+    help = "Envía los correos del outbox (CorreoPendiente) en paralelo, con reintentos y backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=4, help="Envíos simultáneos a SendGrid")
+        parser.add_argument("--lote", type=int, default=50, help="Correos que se toman por vuelta")
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No termina: revisa el outbox cada --intervalo segundos (proceso worker)",
+        )
+        parser.add_argument("--intervalo", type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        enviados = fallidos = 0
+
+        with ThreadPoolExecutor(max_workers=options["hilos"]) as pool:
+            while True:
+                close_old_connections()
+                lote = reclamar_lote(options["lote"])
+
+                if not lote:
+                    if not options["continuo"]:
+                        break
+                    time.sleep(options["intervalo"])
+                    continue
+
+                # Solo el envío (red) va en los hilos; la BD se actualiza aquí
+                resultados = pool.map(self._enviar, lote)
+                for pendiente, error in zip(lote, resultados):
+                    registrar_resultado(pendiente, error)
+                    if error is None:
+                        enviados += 1
+                    else:
+                        fallidos += 1
+                        self.stderr.write(f"[MAIL][OUTBOX] correo {pendiente.id} intento {pendiente.intentos}: {error}")
+
+        self.stdout.write(self.style.SUCCESS(f"Correos enviados: {enviados}, con error: {fallidos}"))
+
+    def _enviar(self, pendiente):
+        try:
+            enviar(pendiente)
+            return None
+        except Exception as e:
+            return e
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_usuario_apodo_usuario_bio_usuario_bloqueado_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatarios', models.JSONField()),
+                ('asunto', models.CharField(max_length=255)),
+                ('texto', models.TextField()),
+                ('html', models.TextField(blank=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lote', models.CharField(blank=True, max_length=32)),
+                ('bloqueado_hasta', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('enviado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Correo pendiente',
+                'verbose_name_plural': 'Correos pendientes',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='usuarios_co_estado_921d53_idx'), models.Index(fields=['lote'], name='usuarios_co_lote_429d0b_idx')],
+            },
+        ),
+    ]
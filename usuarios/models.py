@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 
 class Usuario(AbstractUser):
@@ -32,3 +33,44 @@ class Usuario(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class CorreoPendiente(models.Model):
+    """
+    Outbox de correos: las vistas solo insertan aquí, en la misma transacción
+    que el cambio que los origina, y `manage.py enviar_correos` los envía con
+    reintentos (ver usuarios/correo_utils.py).
+    """
+
+    ESTADOS = [
+        ("pendiente", "Pendiente"),
+        ("enviado", "Enviado"),
+        ("fallido", "Fallido"),
+    ]
+
+    destinatarios = models.JSONField()
+    asunto = models.CharField(max_length=255)
+    texto = models.TextField()
+    html = models.TextField(blank=True)
+
+    estado = models.CharField(max_length=10, choices=ESTADOS, default="pendiente")
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    # Lote del worker que lo tomó y hasta cuándo (si el worker muere, otro lo retoma)
+    lote = models.CharField(max_length=32, blank=True)
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Correo pendiente"
+        verbose_name_plural = "Correos pendientes"
+        indexes = [
+            models.Index(fields=["estado", "proximo_intento"]),
+            models.Index(fields=["lote"]),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} -> {', '.join(self.destinatarios)} ({self.estado})"
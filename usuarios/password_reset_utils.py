@@ -1,9 +1,9 @@
 import random
 import string
-from django.conf import settings
-from django.core.mail import send_mail
 from django.core.cache import cache
 
+from .correo_utils import correo, encolar
+
 
 def generar_codigo_verificacion():
     return ''.join(random.choices(string.digits, k=6))
@@ -27,11 +27,7 @@ def eliminar_codigo_de_cache(email):
 def enviar_codigo_reset(email, code) -> bool:
     subject = "Código de restablecimiento de contraseña"
     message = f"Tu código de verificación es: {code}\n\nEste código es válido por 30 minutos."
-    try:
-        # Usa EMAIL_BACKEND global (SendGrid API)
-        sent = send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
-        print(f"[MAIL][RESET] send_mail sent={sent} to={email}", flush=True)
-        return sent > 0
-    except Exception as e:
-        print(f"[MAIL][RESET] ERROR enviando código a {email}: {e}", flush=True)
-        raise
+    # Queda en el outbox; lo envía manage.py enviar_correos con el EMAIL_BACKEND global (SendGrid API)
+    encolados = encolar(correo(email, subject, message))
+    print(f"[MAIL][RESET] encolado={encolados} to={email}", flush=True)
+    return encolados > 0
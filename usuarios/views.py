@@ -2,7 +2,7 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.db.models import Value, CharField, Q
 from django.db.models.functions import Replace, Lower
 
@@ -130,17 +130,19 @@ def registro(request):
             return render(request, "registro.html", {"data": data, "errores": errores})
 
         try:
-            usuario = Usuario.objects.create_user(
-                username=username,
-                email=email,
-                password=password1,
-                first_name=first_name,
-                last_name=last_name,
-                rut=rut_norm,          # None si no viene
-                is_active=False,       # requiere activación
-                email_verificado=False,
-            )
-            enviar_email_verificacion(usuario, request)
+            # El usuario y su correo de verificación (outbox) se guardan juntos
+            with transaction.atomic():
+                usuario = Usuario.objects.create_user(
+                    username=username,
+                    email=email,
+                    password=password1,
+                    first_name=first_name,
+                    last_name=last_name,
+                    rut=rut_norm,          # None si no viene
+                    is_active=False,       # requiere activación
+                    email_verificado=False,
+                )
+                enviar_email_verificacion(usuario, request)
             messages.success(request, "Te enviamos un correo para verificar tu cuenta.")
             return redirect("usuarios:login")
 